@@ -18,7 +18,17 @@ Available information:
 """
 
 import math
+from array import array
 from copy import deepcopy
+from backend.bits import components, dilate
+from backend.zini import zini, hzini, neighbour_table, _VALUES
+
+# translation tables from values of a board to binary digits
+_MINE_DIGITS = bytes(b'01'[i == 9] for i in range(256))
+_ZERO_DIGITS = bytes(b'01'[i == 0] for i in range(256))
+
+ACTION_FIELDS = 4  # opcode, row, column and time (ms) of an action
+VERSION = 1  # version of the results, to be bumped whenever they change
 
 
 def _divide(a: float, b: float) -> float:
@@ -29,39 +39,84 @@ def _divide(a: float, b: float) -> float:
         return 0.0 if a == 0 else math.inf  # include special cases for infinity (a / 0 = inf) and zero (0 / 0 = 0)
 
 
+class Actions(object):
+    """A sequence of actions packed flat into an array, viewed without copying."""
+
+    def __init__(self, data: array):
+        """Initialize the view over a flat array of actions."""
+        self.view = memoryview(data)
+        self.count = len(data) // ACTION_FIELDS
+
+    def __len__(self) -> int:
+        """Get the number of actions."""
+        return self.count
+
+    def __getitem__(self, current: int) -> memoryview:
+        """Get an action as a writable view of its fields."""
+        if current < 0:
+            current += self.count
+        if not 0 <= current < self.count:
+            raise IndexError('action index out of range')
+        start = current * ACTION_FIELDS
+        return self.view[start:start + ACTION_FIELDS]
+
+
 class Board(object):
     """Generate the board data from input."""
 
     def __init__(self, board: list):
         """Initialize the board."""
         self.result = {}
-        self.result['mines'] = 0
-        self.board = []
-        self.marker = []
-        for each_row in board:
-            mark = [1 if v == '9' else 0 for v in each_row]
-            self.marker.append(mark)  # construct the marks of the board
-            self.board.append(each_row)  # convert the 1D raw board to 2D board
-            self.result['mines'] += sum(mark)
+        self.board = board
 
         # get the information about row, columns
-        self.result['row'] = len(self.board)
-        self.result['column'] = len(self.board[0])
+        self.result['row'] = len(board)
+        self.result['column'] = len(board[0])
+        rows, columns = self.result['row'], self.result['column']
+
+        # parse the board once into a flat grid of values (9 for mines)
+        self.grid = bytes(''.join(''.join(each_row) for each_row in board),
+                          'ascii').translate(_VALUES)
+        self.neighbours = neighbour_table(rows, columns)
+        self.result['mines'] = self.grid.count(9)
         self.result['difficulty'] = self.get_difficulty()
-        self.result['op'] = self.get_openings_or_islands(self.is_opening)
-        self.result['bv'] = self.result[
-            'op'] + self.result['row'] * self.result['column'] - sum(
-                sum(self.marker, []))
-        self.result['is'] = self.get_openings_or_islands(
-            self.is_not_opening_or_mine)
-
-    def is_opening(self, row: int, col: int) -> str:
+
+        # label openings and islands on rows packed into masks
+        mines = self.row_masks(_MINE_DIGITS)
+        zeros = self.row_masks(_ZERO_DIGITS)
+        full = (1 << columns) - 1
+        islands = [
+            ~near & ~mine & full for near, mine in zip(dilate(zeros), mines)
+        ]
+        self.result['op'] = len(components(zeros))
+        self.result['bv'] = self.result['op'] + sum(
+            mask.bit_count() for mask in islands)
+        self.result['is'] = len(components(islands))
+
+    def index(self, row: int, col: int) -> int:
+        """Get the flat index of a block."""
+        return row * self.result['column'] + col
+
+    def value(self, row: int, col: int) -> int:
+        """Get the value of a block (9 for mines)."""
+        return self.grid[row * self.result['column'] + col]
+
+    def row_masks(self, digits: bytes) -> list[int]:
+        """Pack the rows of the grid into masks of blocks selected by a digit table."""
+        columns = self.result['column']
+        selected = self.grid.translate(digits)
+        return [
+            int(selected[start:start + columns][::-1], 2)
+            for start in range(0, len(selected), columns)
+        ]
+
+    def is_opening(self, row: int, col: int) -> bool:
         """Judge the current position is an opening."""
-        return self.board[row][col] == '0'
+        return self.grid[row * self.result['column'] + col] == 0
 
-    def is_not_opening_or_mine(self, row: int, col: int) -> str:
+    def is_not_opening_or_mine(self, row: int, col: int) -> bool:
         """Judge the current position is not an opening or a mine."""
-        return self.board[row][col] not in '09'
+        return 0 < self.grid[row * self.result['column'] + col] < 9
 
     def is_not_marked(self, row: int, col: int) -> bool:
         """Judge the current block is marked."""
@@ -84,33 +139,31 @@ class Board(object):
 
     def filtered_adjacent(self, row: int, col: int, filters: bool):
         """Yield filtered adjacent coordinates."""
-        adjacent = [(row - 1, col - 1), (row, col - 1), (row + 1, col - 1),
-                    (row - 1, col), (row + 1, col), (row - 1, col + 1),
-                    (row, col + 1), (row + 1, col + 1)]
-        for r, c in adjacent:
-            if 0 <= r < self.result['row'] and 0 <= c < self.result[
-                    'column'] and filters(r, c):
+        columns = self.result['column']
+        for v in self.neighbours[row * columns + col]:
+            r, c = divmod(v, columns)
+            if filters(r, c):
                 yield r, c
 
     def recur_mark(self, row: int, col: int, condition: bool):
-        """Mark an area recursively."""
+        """Mark an area iteratively, spreading from the blocks meeting the condition."""
         self.marker[row][col] = 1
-        if condition(row, col):
-            for next_row, next_col in self.filtered_adjacent(
-                    row, col, self.is_not_marked):
-                self.marker[next_row][next_col] = 1
-                self.recur_mark(next_row, next_col, condition)
-
-    def get_openings_or_islands(self, condition: bool) -> int:
-        """Get opening or islands of a board."""
-        items = 0
-        for v in range(self.result['row'] * self.result['column']):
-            row = v // self.result['column']
-            col = v % self.result['column']
-            if not self.marker[row][col] and condition(row, col):
-                items += 1
-                self.recur_mark(row, col, condition)
-        return items
+        stack = [(row, col)]
+        while stack:
+            row, col = stack.pop()
+            if condition(row, col):
+                for next_row, next_col in self.filtered_adjacent(
+                        row, col, self.is_not_marked):
+                    self.marker[next_row][next_col] = 1
+                    stack.append((next_row, next_col))
+
+    def get_zini(self) -> int:
+        """Get the ZiNi of the board, chording the highest premium first."""
+        return zini(self.grid, self.neighbours)
+
+    def get_hzini(self) -> int:
+        """Get the HZiNi of the board, chording in reading order."""
+        return hzini(self.grid, self.neighbours)
 
     def get_result(self) -> dict:
         """Get the result in dict format."""
@@ -121,13 +174,13 @@ class Record(Board):
     """Generate record data from board and action."""
 
     def __init__(self, board: list, action: list, initial: list = None):
-        """Initialize the record."""
+        """Initialize the record, with actions in lists or packed flat into an array."""
         super(Record, self).__init__(board)
         self._threshold = 10  # the threshold between press and release
         self.marker = [[0 for _ in range(self.result['column'])]
                        for _ in range(self.result['row'])]
         self.op_marker = deepcopy(self.marker)
-        self.action = action
+        self.action = action if isinstance(action, list) else Actions(action)
         for current in range(len(self.action)):
             self.__refine_action(current)
         self.result['rtime'] = self.action[-1][3] / 1000
@@ -183,19 +236,20 @@ class Record(Board):
     def __is_opening_fully_opened(self, row: int, col: int) -> bool:
         """Find an opening is fully opened to judge whether a valid op/bv is solved."""
         self.op_marker[row][col] = 1
-        if self.marker[row][col] != 1:
-            return False
+        stack = [(row, col)]
+        while stack:
+            row, col = stack.pop()
+            if self.marker[row][col] != 1:
+                return False  # truncate once a block is not opened
 
-        state = True
-        for next_row, next_col in self.filtered_adjacent(
-                row, col, self.is_opening):
-            if self.op_marker[next_row][next_col] == 0:
-                self.op_marker[next_row][
-                    next_col] == 1  # mark the opening (excluding edges)
-                state = state and self.__is_opening_fully_opened(
-                    next_row, next_col)  # truncate if state is False already
+            for next_row, next_col in self.filtered_adjacent(
+                    row, col, self.is_opening):
+                if self.op_marker[next_row][next_col] == 0:
+                    # mark the opening (excluding edges)
+                    self.op_marker[next_row][next_col] = 1
+                    stack.append((next_row, next_col))
 
-        return state
+        return True
 
     def __deal_with_click(self, row: int, col: int) -> bool:
         """Deal with clicking operation (corresponding to opcode 0)."""
@@ -203,9 +257,9 @@ class Record(Board):
             return False  # do nothing, the click is ineffective
 
         # the block is not opened otherwise
-        if self.board[row][col] == '9':  # step on a mine, oops
+        if self.value(row, col) == 9:  # step on a mine, oops
             self.marker[row][col] = -2  # mark the blast with a special number
-        elif self.board[row][col] == '0':  # step on an opening, ^wow^
+        elif self.value(row, col) == 0:  # step on an opening, ^wow^
             self.marker[row][col] = 1
             self.recur_mark(
                 row, col,
@@ -215,10 +269,8 @@ class Record(Board):
             self.result['solved_op'] += op_fully_opened
         else:  # normal click, nothing happens
             # bv is added when the click is not on the edge of an opening
-            self.result['solved_bv'] += ('0' not in [
-                self.board[r][c]
-                for r, c in self.filtered_adjacent(row, col, self.is_opening)
-            ])
+            self.result['solved_bv'] += not any(
+                self.filtered_adjacent(row, col, self.is_opening))
             self.marker[row][col] = 1
 
         return True  # any direct click is effective
@@ -229,9 +281,9 @@ class Record(Board):
             self.result['flags'] += 1  # count flags
             self.marker[row][col] = -1  # mark the flag
             self.result[
-                'misflags'] += self.board[row][col] != '9'  # count misflags
+                'misflags'] += self.value(row, col) != 9  # count misflags
         elif self.marker[row][col] == -1:  # unflagging
-            misunflag_tag = self.board[row][col] == '9'
+            misunflag_tag = self.value(row, col) == 9
             self.result['flags'] -= 1  # count flags
             self.marker[row][col] = 0  # unmark the flag
             self.result['misunflags'] += misunflag_tag  # count misunflags
@@ -246,7 +298,7 @@ class Record(Board):
             self.filtered_adjacent(row, col, self.is_marked_flag))
         adjacent_unopened = list(
             self.filtered_adjacent(row, col, self.is_not_marked))
-        if len(adjacent_flagged) != int(self.board[row][col]) or len(
+        if len(adjacent_flagged) != self.value(row, col) or len(
                 adjacent_flagged) == 0 or len(adjacent_unopened) == 0:
             # trivial case, the chord operation is ineffective here
             return False
@@ -256,7 +308,7 @@ class Record(Board):
 
         for r, c in adjacent_flagged:
             # if misjudge, mark with a special number (-3), otherwise remain the original status (-1)
-            self.marker[r][c] -= 2 * (self.board[r][c] != '9')
+            self.marker[r][c] -= 2 * (self.value(r, c) != 9)
 
         return True
 
@@ -265,11 +317,11 @@ class Record(Board):
         return self.marker[row][col] == -1
 
     def get_action_detail(self):
-        """Get total path length (Euclidean), clicks (L, R, D, total), clicks per second (cls), and style from action."""
+        """Get total path length (Euclidean, through moves if any), clicks (L, R, D, total), clicks per second (cls), and style from action."""
         self.result['path'], self.result['left'], self.result[
             'right'], self.result['double'], current, last = 0, 0, 0, 0, 0, 0
         while current < len(self.action):
-            if self.action[current][0] in [0, 1, 4]:
+            if self.action[current][0] in [0, 1, 4, 5]:
                 self.result['path'] += math.sqrt(
                     (self.action[current][1] - self.action[last][1])**2 +
                     (self.action[current][2] - self.action[last][2])**
@@ -306,6 +358,7 @@ class Record(Board):
     def replay_stepwise(self, current):
         """Replay the game stepwise to gather detailed information."""
         opcode, row, col, _ = self.action[current]
+        row, col = int(row), int(col)  # positions may be fractional in a flat array
         if opcode == 0:
             self.result['ce'] += self.__deal_with_click(row, col)
         elif opcode == 1:
@@ -0,0 +1,219 @@
+"""
+A content-addressed cache of analyzer results on disk.
+
+A record is keyed by a hash of its board, actions and initial board, together
+with the version of the analyzer, so a result is only computed again when the
+record or the analyzer changes. A replay file is keyed by a hash of its bytes
+and the version of the importer as well, so it is not even parsed when cached.
+The least recently used results are dropped once the cache grows beyond its
+size limit. Results of compacted moves are keyed apart by the error bound of
+the compaction.
+"""
+
+import struct
+import sqlite3
+import marshal
+import hashlib
+from array import array
+from functools import partial
+from multiprocessing import Pool
+from _analyzer import Record, VERSION
+from _importer import read, find, VERSION as IMPORTER_VERSION
+from _compact import compact as compact_moves
+
+LIMIT = 256 << 20  # bytes of results kept by default
+TRIM_RATIO = 0.9  # part of the limit kept after dropping results
+CHUNK = 500  # keys in a query, below the variable limit of SQLite
+BATCH = 4096  # records looked up together
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS results (
+    key BLOB PRIMARY KEY,
+    result BLOB NOT NULL,
+    used INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_used ON results (used);
+'''
+
+
+def record_key(board: list, action, initial: list = None,
+               compact: float = None) -> bytes: # yapf: disable
+    """Hash a record, with actions in lists or packed flat into an array."""
+    if not isinstance(action, array):
+        action = array('d', (v for each in action for v in each))
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(struct.pack('<III?', VERSION, len(board), len(board[0]),
+                              initial is not None))
+    digest.update(''.join(''.join(each_row) for each_row in board).encode())
+    if initial is not None:
+        digest.update(''.join(''.join(each_row)
+                              for each_row in initial).encode())
+    digest.update(action.tobytes())
+    if compact is not None:
+        digest.update(struct.pack('<d', compact))  # error bound of the moves
+    return digest.digest()
+
+
+def analyze_record(record: tuple, compact: float = None) -> dict:
+    """Analyze a record of a board, actions and an optional initial board."""
+    board, action, *initial = record
+    if compact is not None:
+        action = compact_moves(action, compact)
+    return Record(board, action, *initial).get_result()
+
+
+def file_key(path: str, compact: float = None) -> tuple[str, bytes]:
+    """Hash a replay file, getting None as the key if it is unreadable."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(struct.pack('<II', VERSION, IMPORTER_VERSION))
+    if compact is not None:
+        digest.update(struct.pack('<d', compact))  # error bound of the moves
+    try:
+        with open(path, 'rb') as file:
+            digest.update(file.read())
+    except OSError:
+        return path, None
+    return path, digest.digest()
+
+
+def analyze_file(path: str, compact: float = None) -> tuple[str, dict]:
+    """Analyze a replay file, getting None as the result if unreadable."""
+    try:
+        return path, analyze_record(read(path, compact))
+    except (ValueError, IndexError, struct.error, OSError):
+        return path, None
+
+
+class Cache(object):
+    """A content-addressed cache of analyzer results on disk."""
+
+    def __init__(self, path: str, limit: int = LIMIT):
+        """Open a cache holding results of some bytes at most."""
+        self.limit: int = limit
+        self.connection: sqlite3.Connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.executescript(SCHEMA)
+        used, size = self.connection.execute(
+            'SELECT MAX(used), SUM(LENGTH(result)) FROM results').fetchone()
+        self.clock: int = (used or 0) + 1  # order of the uses of the results
+        self.size: int = size or 0
+
+    def get_many(self, keys) -> dict[bytes, dict]:
+        """Look up the results of many keys at once, getting the ones found."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        for start in range(0, len(keys), CHUNK):
+            chunk = keys[start:start + CHUNK]
+            found.update(
+                (key, marshal.loads(result))
+                for key, result in self.connection.execute(
+                    'SELECT key, result FROM results WHERE key IN '
+                    f'({", ".join("?" * len(chunk))})', chunk))
+        with self.connection:
+            self.connection.executemany(
+                'UPDATE results SET used = ? WHERE key = ?',
+                ((self.clock, key) for key in found))
+        self.clock += 1
+        return found
+
+    def get(self, key: bytes) -> dict:
+        """Look up the result of a key, getting None if it is missing."""
+        return self.get_many((key, )).get(key)
+
+    def put_many(self, items):
+        """Store the results of many keys, as (key, result) pairs."""
+        with self.connection:
+            for key, result in items:
+                data = marshal.dumps(result)
+                inserted = self.connection.execute(
+                    'INSERT OR IGNORE INTO results VALUES (?, ?, ?)',
+                    (key, data, self.clock)).rowcount
+                self.size += len(data) * inserted
+        self.clock += 1
+        self.trim()
+
+    def put(self, key: bytes, result: dict):
+        """Store the result of a key."""
+        self.put_many(((key, result), ))
+
+    def trim(self):
+        """Drop the least recently used results while beyond the size limit."""
+        if self.size <= self.limit:
+            return
+        dropped = []
+        for key, size in self.connection.execute(
+                'SELECT key, LENGTH(result) FROM results ORDER BY used'):
+            if self.size <= self.limit * TRIM_RATIO:
+                break
+            dropped.append((key, ))
+            self.size -= size
+        with self.connection:
+            self.connection.executemany('DELETE FROM results WHERE key = ?',
+                                        dropped)
+
+    def analyze(self, records, processes: int = 1,
+                compact: float = None) -> list[dict]: # yapf: disable
+        """Analyze records of (board, actions, initial), computing the new."""
+        records = list(records)
+        keys = [record_key(*record, compact=compact) for record in records]
+        analyze = partial(analyze_record, compact=compact)
+        found = self.get_many(keys)
+        missing = {
+            key: record
+            for key, record in zip(keys, records) if key not in found
+        }
+        if processes == 1:
+            results = map(analyze, missing.values())
+            computed = dict(zip(missing, results))
+        else:
+            with Pool(processes) as pool:
+                computed = dict(
+                    zip(missing, pool.map(analyze, missing.values())))
+        self.put_many(computed.items())
+        found.update(computed)
+        return [found[key] for key in keys]
+
+    def analyze_files(self, paths, processes: int = None,
+                      chunksize: int = 64,
+                      compact: float = None): # yapf: disable
+        """Analyze replay files in parallel, yielding (path, result) pairs."""
+        with Pool(processes) as pool:
+            keyed = pool.imap(partial(file_key, compact=compact), paths,
+                              chunksize)
+            while True:
+                batch = dict(item for _, item in zip(range(BATCH), keyed))
+                if not batch:
+                    return
+                found = self.get_many(k for k in batch.values() if k)
+                missing = []
+                for path, key in batch.items():
+                    if key in found:
+                        yield path, found[key]
+                    elif key is None:
+                        yield path, None
+                    else:
+                        missing.append(path)
+                computed = []
+                for path, result in pool.imap_unordered(
+                        partial(analyze_file, compact=compact), missing,
+                        chunksize):
+                    computed.append((batch[path], result))
+                    yield path, result
+                self.put_many(item for item in computed if item[1] is not None)
+
+    def close(self):
+        """Close the cache."""
+        self.connection.close()
+
+
+if __name__ == '__main__':
+    import sys
+    import json
+
+    # analyze the replays under the given directories into json lines, with
+    # the results cached in the given file
+    cache = Cache(sys.argv[1])
+    for path, result in cache.analyze_files(
+            path for root in sys.argv[2:] for path in find(root)):
+        print(json.dumps({'path': path, 'result': result}))
+    cache.close()
@@ -0,0 +1,198 @@
+"""
+A lossy-bounded compaction of the mouse tracks in actions of the analyzer.
+
+The moves (opcode 5) between two other actions are a polyline of the mouse,
+which is simplified by Douglas-Peucker: a run of moves is replaced by the
+segment joining its ends when no move is farther from it than an error bound
+in pixels, and is split at its farthest move otherwise. As segments are the
+shortest, a compacted record has a shorter path; the error bounds of the runs
+losing the most are halved until the whole path loses at most a tolerance of
+its length, so the path stays within [1 - tolerance, 1] of the original one.
+
+Every other action (clicks, flags, chords, presses and releases), together
+with the first and last ones, is kept exactly, so the results of the analyzer
+are the same except for the path and its derived metrics.
+"""
+
+import math
+import heapq
+import struct
+from array import array
+from _analyzer import ACTION_FIELDS
+
+MOVE = 5  # opcode of a move
+PATH = (0, 1, 4, 5)  # opcodes of the actions along the path
+PIXELS = 1.0  # default error bound of a compacted track in pixels
+SIZE = 16  # default pixels of a block
+TOLERANCE = 0.05  # default part of the path lost by compaction at most
+REFINEMENTS = 8  # halvings of the error bound before a track is kept whole
+
+
+def distance(x: float, y: float, x0: float, y0: float, x1: float,
+             y1: float) -> float: # yapf: disable
+    """Get the distance from a point to a segment."""
+    dx, dy = x1 - x0, y1 - y0
+    length = dx * dx + dy * dy
+    if length:
+        t = max(0.0, min(1.0, ((x - x0) * dx + (y - y0) * dy) / length))
+        x0, y0 = x0 + t * dx, y0 + t * dy
+    return math.hypot(x - x0, y - y0)
+
+
+def simplify(rows: list[float], cols: list[float],
+             epsilon: float) -> list[int]: # yapf: disable
+    """Get the points kept of a polyline by Douglas-Peucker, with both ends."""
+    kept = [0, len(rows) - 1]
+    stack = [(0, len(rows) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        r0, c0, r1, c1 = rows[first], cols[first], rows[last], cols[last]
+        farthest, split = -1.0, first
+        for i in range(first + 1, last):
+            d = distance(rows[i], cols[i], r0, c0, r1, c1)
+            if d > farthest:
+                farthest, split = d, i
+        if farthest > epsilon:
+            kept.append(split)
+            stack.append((first, split))
+            stack.append((split, last))
+    kept.sort()
+    return kept
+
+
+def length(rows: list[float], cols: list[float], points) -> float:
+    """Get the length of a polyline through some of its points."""
+    points = list(points)
+    return sum(
+        math.hypot(rows[j] - rows[i], cols[j] - cols[i])
+        for i, j in zip(points, points[1:]))
+
+
+class Track(object):
+    """A track of moves between two kept actions, simplified at some level."""
+
+    def __init__(self, points: list[int], rows: list[float],
+                 cols: list[float], epsilon: float): # yapf: disable
+        """Simplify the track of the actions at some points under an error bound."""
+        self.points: list[int] = points
+        self.rows: list[float] = [rows[i] for i in points]
+        self.cols: list[float] = [cols[i] for i in points]
+        self.path: float = length(self.rows, self.cols, range(len(points)))
+        self.epsilon: float = epsilon
+        self.level: int = 0  # halvings of the error bound
+        self.simplify()
+
+    def simplify(self):
+        """Simplify the track under the current error bound, or keep it whole."""
+        if self.level < REFINEMENTS:
+            self.kept = simplify(self.rows, self.cols,
+                                 self.epsilon / (1 << self.level))
+        else:
+            self.kept = list(range(len(self.points)))
+        self.lost: float = self.path - length(self.rows, self.cols, self.kept)
+
+    def refine(self):
+        """Halve the error bound, losing less of the path."""
+        self.level += 1
+        self.simplify()
+
+
+def kept_actions(actions, epsilon: float, tolerance: float) -> list[int]:
+    """Get the indices of the actions kept by the compaction of their moves."""
+    if isinstance(actions, list):
+        fields = [v for action in actions for v in action[:ACTION_FIELDS]]
+    else:
+        fields = actions
+    count = len(fields) // ACTION_FIELDS
+    if not count:
+        return []
+    opcodes = fields[0::ACTION_FIELDS]
+    rows, cols = fields[1::ACTION_FIELDS], fields[2::ACTION_FIELDS]
+    keep = bytearray(count)
+    keep[0] = keep[-1] = 1
+    for i in range(count):
+        if opcodes[i] != MOVE:
+            keep[i] = 1
+    # the path of the analyzer starts from the first action, whatever it is
+    points = [0] + [i for i in range(1, count) if opcodes[i] in PATH]
+    tracks, start = [], 0
+    for end in range(1, len(points)):
+        if keep[points[end]]:
+            if end - start > 1:
+                tracks.append(
+                    Track(points[start:end + 1], rows, cols, epsilon))
+            start = end
+    # the tracks losing the most are refined first, until the whole path
+    # loses a tolerable part
+    path = sum(track.path for track in tracks)
+    lost = sum(track.lost for track in tracks)
+    heap = [(-track.lost, i) for i, track in enumerate(tracks) if track.lost]
+    heapq.heapify(heap)
+    while heap and lost > tolerance * path:
+        _, i = heapq.heappop(heap)
+        track = tracks[i]
+        lost -= track.lost
+        track.refine()
+        lost += track.lost
+        if track.lost:
+            heapq.heappush(heap, (-track.lost, i))
+    for track in tracks:
+        for i in track.kept:
+            keep[track.points[i]] = 1
+    return [i for i in range(count) if keep[i]]
+
+
+def compact(actions, pixels: float = PIXELS, size: int = SIZE,
+            tolerance: float = TOLERANCE): # yapf: disable
+    """Compact the moves of actions in lists or packed flat into an array."""
+    kept = kept_actions(actions, pixels / size, tolerance)
+    if isinstance(actions, list):
+        return [actions[i] for i in kept]
+    compacted = array(actions.typecode)
+    for i in kept:
+        compacted.extend(actions[i * ACTION_FIELDS:(i + 1) * ACTION_FIELDS])
+    return compacted
+
+
+def path_length(actions) -> float:
+    """Get the path of actions as the analyzer gets it."""
+    if not isinstance(actions, list):
+        actions = [
+            actions[start:start + ACTION_FIELDS]
+            for start in range(0, len(actions), ACTION_FIELDS)
+        ]
+    path, last = 0.0, actions[0]
+    for action in actions:
+        if action[0] in PATH:
+            path += math.hypot(action[1] - last[1], action[2] - last[2])
+            last = action
+    return path
+
+
+def compaction(actions, pixels: float = PIXELS,
+               tolerance: float = TOLERANCE) -> dict: # yapf: disable
+    """Compact actions, getting how much they shrink."""
+    compacted = compact(actions, pixels, SIZE, tolerance)
+    return {
+        'actions': len(actions) // ACTION_FIELDS,
+        'compacted': len(compacted) // ACTION_FIELDS,
+        'path': path_length(actions),
+        'compacted_path': path_length(compacted),
+    }
+
+
+if __name__ == '__main__':
+    import sys
+    import json
+    from _importer import read, find
+
+    # compact the replays under the given directories, printing json lines
+    for root in sys.argv[1:]:
+        for path in find(root):
+            try:
+                result = compaction(read(path)[1])
+            except (ValueError, IndexError, struct.error, OSError):
+                result = None
+            print(json.dumps({'path': path, 'result': result}))
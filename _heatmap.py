@@ -0,0 +1,203 @@
+"""
+Heatmaps of clicks across many games, by board size.
+
+For every block of a board size, these maps are summed over the games:
+* clicks (opcode 0), flags (opcode 1) and chords (opcode 4).
+* times (ms) when the block is first opened, with the games opening it.
+
+Maps are accumulated into preallocated arrays in a streaming pass, which is
+spread over processes for replay files. They are saved as raw arrays behind
+a small header, so loading them is a view over the file without parsing.
+"""
+
+import struct
+from array import array
+from multiprocessing import Pool
+from backend.zini import _VALUES, neighbour_table
+from _importer import read, find
+
+MAGIC = b'MSHM'  # the header of a heatmap
+HEADER = struct.Struct('<4sIII')  # magic, rows, columns, games
+MAPS = ('click', 'flag', 'chord', 'opened')  # counts of each block
+CHUNK = 256  # replay files aggregated by a process at a time
+MISFLAGGED = 2  # a wrong flag found by a chord, which is not a flag any more
+
+
+class Heatmap(object):
+    """Heatmaps of clicks across many games of a board size."""
+
+    def __init__(self, rows: int, columns: int):
+        """Initialize empty maps of a board size."""
+        self.rows: int = rows
+        self.columns: int = columns
+        self.games: int = 0
+        count = rows * columns
+        self.counts: dict[str, array] = {
+            name: array('I', bytes(4 * count))
+            for name in MAPS
+        }
+        self.first_open: array = array('d', bytes(8 * count))  # sums of times
+        self.neighbours: tuple[tuple[int]] = neighbour_table(rows, columns)
+
+    def add(self, board: list, actions):
+        """Add a game of board rows and flat (or listed) actions."""
+        rows, columns = self.rows, self.columns
+        grid = bytes(''.join(''.join(each_row) for each_row in board),
+                     'ascii').translate(_VALUES)
+        neighbours = self.neighbours
+        click, flag, chord = (self.counts[name]
+                              for name in ('click', 'flag', 'chord'))
+        opened_count, first_open = self.counts['opened'], self.first_open
+        opened = bytearray(len(grid))
+        flagged = bytearray(len(grid))
+
+        def open_from(index: int, time: float):
+            """Open a block, spreading over openings, and time the opened ones."""
+            stack = [index]
+            opened[index] = 1
+            while stack:
+                index = stack.pop()
+                if grid[index] == 9:
+                    continue  # a blast is not timed
+                opened_count[index] += 1
+                first_open[index] += time
+                if grid[index] == 0:
+                    for i in neighbours[index]:
+                        if not opened[i] and not flagged[i]:
+                            opened[i] = 1
+                            stack.append(i)
+
+        if not isinstance(actions, list):
+            actions = zip(*[iter(actions)] * 4)  # flat actions into fours
+        for opcode, row, col, time in actions:
+            if opcode == 5 or not (0 <= row < rows and 0 <= col < columns):
+                continue
+            index = int(row) * columns + int(col)
+            if opcode == 0:
+                click[index] += 1
+                if not opened[index] and not flagged[index]:
+                    open_from(index, time)
+            elif opcode == 1:
+                flag[index] += 1
+                if not opened[index] and flagged[index] != MISFLAGGED:
+                    flagged[index] ^= 1
+            elif opcode == 4:
+                chord[index] += 1
+                around = neighbours[index]
+                # chords are judged by the flags around only, as the analyzer does
+                if 0 < grid[index] == sum(flagged[i] == 1 for i in around):
+                    closed = [
+                        i for i in around if not opened[i] and not flagged[i]
+                    ]
+                    for i in closed:
+                        if not opened[i]:  # unless opened by an opening
+                            open_from(i, time)
+                    for i in around:
+                        if closed and flagged[i] and grid[i] != 9:
+                            flagged[i] = MISFLAGGED
+        self.games += 1
+
+    def merge(self, other: 'Heatmap'):
+        """Merge the maps of another heatmap of the same board size."""
+        for name in MAPS:
+            mine, theirs = self.counts[name], other.counts[name]
+            for i, v in enumerate(theirs):
+                mine[i] += v
+        for i, v in enumerate(other.first_open):
+            self.first_open[i] += v
+        self.games += other.games
+
+    def mean_first_open(self) -> list[float]:
+        """Get the mean time (ms) when each block is first opened, None if never."""
+        return [
+            t / n if n else None
+            for t, n in zip(self.first_open, self.counts['opened'])
+        ]
+
+    def dump(self) -> bytes:
+        """Dump the maps into raw arrays behind a header."""
+        return HEADER.pack(MAGIC, self.rows, self.columns, self.games) + b''.join(
+            self.counts[name].tobytes() for name in MAPS) + self.first_open.tobytes()
+
+    @classmethod
+    def load(cls, data: bytes, offset: int = 0) -> 'Heatmap':
+        """Load dumped maps as views over the data, without copying them."""
+        magic, rows, columns, games = HEADER.unpack_from(data, offset)
+        if magic != MAGIC:
+            raise ValueError('invalid heatmap')
+        heatmap = cls.__new__(cls)
+        heatmap.rows, heatmap.columns, heatmap.games = rows, columns, games
+        heatmap.neighbours = neighbour_table(rows, columns)
+        count, view = rows * columns, memoryview(data)
+        offset += HEADER.size
+        heatmap.counts = {}
+        for name in MAPS:
+            heatmap.counts[name] = view[offset:offset + 4 * count].cast('I')
+            offset += 4 * count
+        heatmap.first_open = view[offset:offset + 8 * count].cast('d')
+        return heatmap
+
+    def size(self) -> int:
+        """Get the bytes of the dumped maps."""
+        return HEADER.size + self.rows * self.columns * (4 * len(MAPS) + 8)
+
+
+def add_to(heatmaps: dict, board: list, actions):
+    """Add a game to the heatmap of its board size."""
+    size = (len(board), len(board[0]))
+    if size not in heatmaps:
+        heatmaps[size] = Heatmap(*size)
+    heatmaps[size].add(board, actions)
+
+
+def aggregate_files(paths: list[str]) -> bytes:
+    """Aggregate replay files into dumped heatmaps, skipping unreadable ones."""
+    heatmaps = {}
+    for path in paths:
+        try:
+            add_to(heatmaps, *read(path))
+        except (ValueError, IndexError, struct.error, OSError):
+            continue
+    return b''.join(heatmap.dump() for heatmap in heatmaps.values())
+
+
+def aggregate(paths, processes: int = None) -> dict[tuple, Heatmap]:
+    """Aggregate replay files in parallel into heatmaps by board size."""
+    paths = list(paths)
+    chunks = (paths[i:i + CHUNK] for i in range(0, len(paths), CHUNK))
+    heatmaps = {}
+    with Pool(processes) as pool:
+        for data in pool.imap_unordered(aggregate_files, chunks):
+            for heatmap in load(data).values():
+                size = (heatmap.rows, heatmap.columns)
+                if size not in heatmaps:
+                    heatmaps[size] = Heatmap(*size)
+                heatmaps[size].merge(heatmap)
+    return heatmaps
+
+
+def save(heatmaps: dict, path: str):
+    """Save heatmaps of many board sizes into a file."""
+    with open(path, 'wb') as f:
+        for heatmap in heatmaps.values():
+            f.write(heatmap.dump())
+
+
+def load(data: bytes) -> dict[tuple, Heatmap]:
+    """Load the heatmaps of many board sizes as views over dumped data."""
+    heatmaps, offset = {}, 0
+    while offset < len(data):
+        heatmap = Heatmap.load(data, offset)
+        heatmaps[(heatmap.rows, heatmap.columns)] = heatmap
+        offset += heatmap.size()
+    return heatmaps
+
+
+if __name__ == '__main__':
+    import sys
+
+    # aggregate the replays under the given directories into a heatmap file
+    heatmaps = aggregate(path for root in sys.argv[2:] for path in find(root))
+    save(heatmaps, sys.argv[1])
+    for (rows, columns), heatmap in heatmaps.items():
+        print(f'{rows}x{columns}: {heatmap.games} games')
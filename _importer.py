@@ -0,0 +1,285 @@
+"""
+An importer of replay files from other clients for the analyzer.
+
+Supported formats:
+* Arbiter (.avf).
+* Minesweeper X / Viennasweeper (.rmv).
+
+The mouse events of a file are streamed into a flat array of actions
+(opcode, row, column, time in ms), with opcodes 0 (click), 1 (flag),
+4 (chord) and 5 (move), which `_analyzer.Record` reads without copying.
+The moves may be compacted by `_compact` within an error bound in pixels.
+"""
+
+import os
+import re
+import struct
+from array import array
+from multiprocessing import Pool
+from _analyzer import Record
+from _compact import compact as compact_moves
+
+VERSION = 1  # version of the imported actions, to be bumped whenever they change
+
+# mouse events of replay files
+MOVE, LEFT_DOWN, LEFT_UP, RIGHT_DOWN, RIGHT_UP, MIDDLE_DOWN, MIDDLE_UP = range(7)
+
+AVF_SIZE = 16  # pixels of a block in Arbiter
+AVF_LEVELS = {3: (8, 8, 10), 4: (16, 16, 40), 5: (30, 16, 99)}
+AVF_EVENTS = {
+    1: MOVE,
+    3: LEFT_DOWN,
+    5: LEFT_UP,
+    21: LEFT_UP,
+    9: RIGHT_DOWN,
+    17: RIGHT_UP,
+    145: RIGHT_UP,
+    33: MIDDLE_DOWN,
+    65: MIDDLE_UP,
+    193: MIDDLE_UP
+}
+AVF_HEADER = re.compile(rb'\[[0-3]\|')  # the start of the text header
+AVF_RESULT = re.compile(rb'B\d+T\d+[.,]\d+\]')  # the end of the text header
+
+RMV_SIZE = 16  # default pixels of a block
+RMV_EVENTS = {
+    1: MOVE,
+    2: LEFT_DOWN,
+    3: LEFT_UP,
+    4: RIGHT_DOWN,
+    5: RIGHT_UP,
+    6: MIDDLE_DOWN,
+    7: MIDDLE_UP,
+    28: MOVE
+}
+RMV_OFFSETS = {1: (12, 56), 2: (0, 0)}  # pixel offsets of the board by version
+
+
+def layout(columns: int, rows: int, mines) -> list[str]:
+    """Build the board rows of the analyzer from mine (row, column) pairs."""
+    grid = bytearray(rows * columns)
+    for row, col in mines:
+        if not (0 <= row < rows and 0 <= col < columns):
+            raise ValueError('mine out of the board')
+        grid[row * columns + col] = 9
+    for v in range(rows * columns):
+        if grid[v] == 9:
+            continue
+        row, col = divmod(v, columns)
+        grid[v] = sum(
+            grid[r * columns + c] == 9
+            for r in range(max(0, row - 1), min(rows, row + 2))
+            for c in range(max(0, col - 1), min(columns, col + 2)))
+    text = grid.decode('latin-1').translate(
+        {i: str(i) for i in range(10)})
+    return [text[start:start + columns] for start in range(0, len(text), columns)]
+
+
+def translate(events, size: int, rows: int, columns: int) -> array:
+    """Translate mouse events (event, x, y, time in ms) into flat actions."""
+    actions = array('d')
+    left = right = chording = False
+    for event, x, y, time in events:
+        opcode = None
+        if event == MOVE:
+            opcode = 5
+        elif event == LEFT_DOWN:
+            left, chording = True, chording or right
+        elif event == RIGHT_DOWN:
+            right, chording = True, chording or left
+            opcode = None if chording else 1  # flag when pressed alone
+        elif event == LEFT_UP and left:
+            left = False
+            opcode = 4 if right else None if chording else 0
+        elif event == RIGHT_UP and right:
+            right = False
+            opcode = 4 if left else None  # chord on the first release only
+        elif event == MIDDLE_UP:
+            opcode = 4
+        chording = chording and (left or right)
+
+        row, col = y / size, x / size
+        if opcode is not None and 0 <= row < rows and 0 <= col < columns:
+            actions.extend((opcode, row, col, time))
+    return actions
+
+
+def read_avf(data: bytes) -> tuple[list[str], array]:
+    """Read the board and actions of an Arbiter replay."""
+    level = data[5]
+    if level in AVF_LEVELS:
+        columns, rows, mines = AVF_LEVELS[level]
+        offset = 6
+    elif level == 6:
+        columns, rows, mines = data[6] + 1, data[7] + 1, struct.unpack_from(
+            '>H', data, 8)[0]
+        offset = 10
+    else:
+        raise ValueError('invalid level of an avf file')
+    positions = data[offset:offset + 2 * mines]
+    if len(positions) < 2 * mines:
+        raise ValueError('truncated avf file')
+    board = layout(columns, rows, ((positions[i] - 1, positions[i + 1] - 1)
+                                   for i in range(0, len(positions), 2)))
+    offset += 2 * mines
+
+    header = AVF_HEADER.search(data, offset)
+    result = header and AVF_RESULT.search(data, header.end())
+    if not result:
+        raise ValueError('invalid header of an avf file')
+    offset = result.end()
+    # the first event happens at the first second with x < 512
+    while offset < len(data) and (data[offset] != 1 or data[offset - 1] > 1):
+        offset += 1
+    offset -= 2
+
+    def events():
+        """Stream the events of the file until the terminator."""
+        for code, x1, t1, x2, t2, y1, t3, y2 in struct.iter_unpack(
+                '8B', memoryview(data)[offset:len(data) - (len(data) - offset) % 8]):
+            if t1 == 0 and t3 == 0:
+                return
+            if code not in AVF_EVENTS:
+                raise ValueError('invalid event of an avf file')
+            time = ((t3 << 8 | t1) - 1) * 1000 + t2 * 10
+            yield AVF_EVENTS[code], x1 << 8 | x2, y1 << 8 | y2, time
+
+    return board, translate(events(), AVF_SIZE, rows, columns)
+
+
+def read_rmv(data: bytes) -> tuple[list[str], array]:
+    """Read the board and actions of a Minesweeper X / Viennasweeper replay."""
+    if data[:4] != b'*rmv':
+        raise ValueError('not an rmv file')
+    version = struct.unpack_from('>H', data, 4)[0]
+    if version not in RMV_OFFSETS:
+        raise ValueError('unsupported version of an rmv file')
+    offset = 6 + 2 * (version >= 2) + 4  # skip clone info and file size
+    result_size = 0
+    if version == 1:
+        result_size = struct.unpack_from('>H', data, offset)[0]
+        offset += 2
+    info_size = struct.unpack_from('>H', data, offset)[0]
+    offset += 2 + 4  # skip player info and board sizes
+    preflags_size, properties_size = struct.unpack_from('>HH', data, offset)
+    offset += 4 + 2 * (version >= 2) + 6  # skip extension, vid and checksum sizes
+    if version == 1:
+        offset += max(result_size, 3)  # skip the result string
+    offset += info_size
+
+    players = struct.unpack_from('>H', data, offset)[0]
+    offset += 2
+    for _ in range(min(players, 4)):
+        offset += 1 + data[offset]  # skip player name, nick, country and token
+    columns, rows, mines = struct.unpack_from('>BBH', data, offset + 4)
+    offset += 8
+    positions = data[offset:offset + 2 * mines]
+    if len(positions) < 2 * mines:
+        raise ValueError('truncated rmv file')
+    board = layout(columns, rows, ((positions[i + 1], positions[i])
+                                   for i in range(0, len(positions), 2)))
+    offset += 2 * mines
+    preflags = b''
+    if preflags_size > 0:
+        count = struct.unpack_from('>H', data, offset)[0]
+        preflags = data[offset + 2:offset + 2 + 2 * count]
+        offset += 2 + 2 * count
+
+    size = data[offset + 6] if version >= 2 else RMV_SIZE
+    offset += properties_size
+    if version >= 2:
+        extensions = struct.unpack_from('>H', data, offset)[0]
+        offset += 2
+        for _ in range(extensions):
+            offset += 1 + data[offset]  # skip the key
+            offset += 1 + data[offset]  # skip the value
+
+    def events():
+        """Stream the events of the file until the end of the game."""
+        for i in range(0, len(preflags), 2):
+            yield RIGHT_DOWN, preflags[i] * size, preflags[i + 1] * size, 0
+            yield RIGHT_UP, preflags[i] * size, preflags[i + 1] * size, 0
+        current, first = offset, True
+        x, y, time = 0, 0, 0
+        x_offset, y_offset = RMV_OFFSETS[version]
+        while current < len(data):
+            code = data[current]
+            if code == 0 and version == 1:
+                current += 5
+            elif 1 <= code <= 7 or (code == 28 and version >= 2 and not first):
+                if code == 28:
+                    time += data[current + 1]
+                    move = data[current + 2]
+                    x += (move >> 4 & 7) - (move >> 4 & 8)
+                    y += (move & 7) - (move & 8)
+                    current += 3
+                else:
+                    time, x, y = struct.unpack_from('>IHH', data, current + 1)
+                    time >>= 8
+                    x, y = x - x_offset, y - y_offset
+                    current += 9
+                x, y = x & 0xFFFF, y & 0xFFFF
+                if x >= columns * size or y >= rows * size:
+                    x, y = columns * size, rows * size  # out of the board
+                if first:
+                    first = False
+                    yield LEFT_DOWN, x, y, time  # the first press is omitted
+                yield RMV_EVENTS[code], x, y, time
+            elif 9 <= code <= 14 or 18 <= code <= 27:
+                current += 3
+            elif 15 <= code <= 17:
+                return
+            else:
+                raise ValueError('invalid event of an rmv file')
+        raise ValueError('truncated rmv file')
+
+    return board, translate(events(), size, rows, columns)
+
+
+READERS = {'.avf': read_avf, '.rmv': read_rmv}
+
+
+def read(path: str, compact: float = None) -> tuple[list[str], array]:
+    """Read the board and actions of a replay file, compacting moves within some pixels if given."""
+    reader = READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise ValueError('unsupported replay file')
+    with open(path, 'rb') as file:
+        board, actions = reader(file.read())
+    if not actions:
+        raise ValueError('no actions in the replay')
+    if compact is not None:
+        actions = compact_moves(actions, compact)
+    return board, actions
+
+
+def analyze(path: str) -> tuple[str, dict]:
+    """Analyze a replay file, getting None as the result if it is unreadable."""
+    try:
+        return path, Record(*read(path)).get_result()
+    except (ValueError, IndexError, struct.error, OSError):
+        return path, None
+
+
+def analyze_all(paths, processes: int = None, chunksize: int = 64):
+    """Analyze replay files in parallel, yielding (path, result) as they finish."""
+    with Pool(processes) as pool:
+        yield from pool.imap_unordered(analyze, paths, chunksize)
+
+
+def find(root: str):
+    """Find the replay files under a directory."""
+    for folder, _, names in os.walk(root):
+        for name in names:
+            if os.path.splitext(name)[1].lower() in READERS:
+                yield os.path.join(folder, name)
+
+
+if __name__ == '__main__':
+    import sys
+    import json
+
+    # analyze the replays under the given directories into json lines
+    for path, result in analyze_all(
+            path for root in sys.argv[1:] for path in find(root)):
+        print(json.dumps({'path': path, 'result': result}))
@@ -2,8 +2,23 @@
 Backend for the minesweeper game.
 
 This file focus on inner logic of minesweeper, and does not handle UI logics.
-This file contains three classes:
+This file contains these classes:
 - Tile: Minimum unit of minesweeper
 - Board: A number of tiles
+- HugeBoard: A board stored in lazily materialized chunks instead of tiles
 - Counter: A number of game statistics
+- Frontier: The revealed numbers of a board and the covered tiles around them
+- Probability: Exact mine probabilities of the covered tiles
+- Logic: Safe tiles and mines deduced from the visible numbers alone
+- Replay: Play back a recorded game with keyframe seeking
+- Runner: Replay recorded actions straight on a board without any UI
+- Feed: A versioned feed of the status changes of a board
+- Layout: A compact bit-packed encoding of boards and corpora of boards
+- ZiNi: Estimates of the fewest clicks solving a board with flags and chords
+- Efficiency: Live efficiency metrics of a game, as the analyzer gets them
+- History: A log of board changes for undo, redo and time travel
+- Store: A local history of finished games in SQLite
+- Autosave: Snapshots of the game in progress for crash recovery
+- Mirror: Live statistics of a game in shared memory, for external readers
+- Background: Statistics and analysis of games computed by worker processes
 """
@@ -0,0 +1,88 @@
+"""Autosave: snapshots of the game in progress for crash recovery."""
+
+from threading import Thread, Condition
+
+import os
+import zlib
+import marshal
+
+MAGIC = b'MSAV\x01'  # the header of a snapshot file, with a format version
+CLEAR = object()  # a request for removing the snapshot file
+
+
+def encode(snapshot: tuple) -> bytes:
+    """Serialize a snapshot compactly."""
+    return MAGIC + zlib.compress(marshal.dumps(snapshot))
+
+
+def decode(data: bytes) -> tuple:
+    """Deserialize a snapshot, or get None if it is invalid."""
+    if not data.startswith(MAGIC):
+        return None
+    try:
+        return marshal.loads(zlib.decompress(data[len(MAGIC):]))
+    except (zlib.error, ValueError, EOFError, TypeError):
+        return None
+
+
+class Autosave(object):
+    """Autosave: snapshots of the game in progress for crash recovery."""
+
+    def __init__(self, path: str):
+        """Prepare the snapshot file, written on a background thread."""
+        self.path: str = path
+        self.condition: Condition = Condition()
+        self.pending: any = None  # the latest request waiting to be written
+        self.saved: bool = os.path.exists(path)  # whether a snapshot is on disk
+        self.closed: bool = False
+        self.writer: Thread = Thread(target=self.write, daemon=True)
+        self.writer.start()
+
+    def save(self, game):
+        """Save a snapshot of the game in progress, or clear it otherwise."""
+        if game.in_progress():
+            self.request(game.snapshot())
+        elif self.saved:
+            self.request(CLEAR)
+
+    def request(self, request: any):
+        """Replace the pending request, as only the latest one matters."""
+        with self.condition:
+            self.pending = request
+            self.saved = request is not CLEAR
+            self.condition.notify()
+
+    def write(self):
+        """Write the requested snapshots atomically until closed."""
+        while True:
+            with self.condition:
+                self.condition.wait_for(
+                    lambda: self.pending is not None or self.closed)
+                request, self.pending = self.pending, None
+                if request is None:
+                    return
+            if request is CLEAR:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                continue
+            temp = self.path + '.tmp'
+            with open(temp, 'wb') as f:
+                f.write(encode(request))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp, self.path)
+
+    def load(self) -> tuple:
+        """Load the saved snapshot, or get None if there is not any."""
+        try:
+            with open(self.path, 'rb') as f:
+                return decode(f.read())
+        except OSError:
+            return None
+
+    def close(self):
+        """Write the pending snapshot and stop the writer."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.writer.join()
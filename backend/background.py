@@ -0,0 +1,113 @@
+"""Background: statistics and analysis of games computed by worker processes.
+
+A job is a small picklable snapshot of a game: the size of its board, its
+mines, and its states or actions if needed. A worker rebuilds the board from
+it, so the game goes on while its statistics are computed. Processes are
+used rather than threads, as the pure Python work would otherwise hold the
+interpreter lock against the UI.
+
+Each new game bumps the generation of the pool, cancelling the jobs not
+started yet; the results of the others are delivered with their generation,
+so the receiver drops the outdated ones. A failed job delivers its error as
+the result, for the receiver to compute it by itself instead.
+"""
+
+from .board import Board
+from .efficiency import Efficiency
+from .runner import record_settings
+from .stats import STATS
+from .zini import neighbour_table, zini, hzini
+from concurrent.futures import ProcessPoolExecutor, BrokenExecutor
+from threading import Lock
+
+BASIC = (STATS.BBBV, STATS.OP, STATS.IS)  # statistics of a covered board
+_boards: dict[tuple, Board] = {}  # boards of a worker by their size
+
+
+def board_of(width: int, height: int, mines: list[int]) -> Board:
+    """Get a board of a worker with the mines laid, reusing one of its size."""
+    kind = (width, height, len(mines))
+    board = _boards.get(kind)
+    if board is None:
+        board = Board(record_settings(height, width, len(mines)))
+        _boards[kind] = board
+    else:
+        board.clear_tiles()
+    board.load_layout(mines)
+    return board
+
+
+def basic(job: tuple) -> tuple:
+    """Compute the basic statistics of a board, with the 3BV markers of its tiles."""
+    board = board_of(*job)
+    board.calc_basic_stats()
+    return ([board.stats[i] for i in BASIC], board.marker, board.op_is_counter,
+            board.values())
+
+
+def analyze(job: tuple) -> dict:
+    """Analyze a finished game: its statistics, ZiNi, HZiNi and efficiency."""
+    width, height, mines, states, actions = job
+    board = board_of(width, height, mines)
+    board.calc_basic_stats()
+    board.load_states(states)  # solving the opened tiles again
+    values, table = board.values(), neighbour_table(height, width)
+    efficiency = Efficiency(values, height, width, board.stats[STATS.BBBV])
+    for action in actions:
+        efficiency.add(*action)
+    return {
+        'stats': list(board.stats),
+        'zini': zini(values, table),
+        'hzini': hzini(values, table),
+        **efficiency.result(),
+    }
+
+
+class Background(object):
+    """Background: a pool of worker processes for the statistics of games."""
+
+    def __init__(self, deliver: callable, processes: int = 1,
+                 context: any = None): # yapf: disable
+        """Start the workers of a multiprocessing context, delivering (generation, name, result) of each job."""
+        self.deliver: callable = deliver
+        self.pool: ProcessPoolExecutor = ProcessPoolExecutor(
+            processes, mp_context=context)
+        self.generation: int = 0  # bumped by each new game
+        self.futures: set = set()  # jobs not finished yet
+        self.lock: Lock = Lock()  # of the futures, shared with the pool
+        self.pool.submit(int)  # start the workers before the first game
+
+    def submit(self, name: str, func: callable, job: tuple):
+        """Run a job in a worker, delivering its result unless cancelled."""
+        generation = self.generation
+
+        def done(future):
+            """Deliver the result or error of a job, called by a thread of the pool."""
+            with self.lock:
+                self.futures.discard(future)
+            if not future.cancelled():
+                error = future.exception()
+                self.deliver(generation, name,
+                             future.result() if error is None else error)
+
+        try:
+            future = self.pool.submit(func, job)
+        except BrokenExecutor as error:
+            self.deliver(generation, name, error)  # a worker died
+            return
+        with self.lock:
+            self.futures.add(future)
+        future.add_done_callback(done)
+
+    def cancel(self):
+        """Outdate the jobs of the current game, cancelling the ones not started."""
+        self.generation += 1
+        with self.lock:
+            futures = list(self.futures)
+        for future in futures:
+            future.cancel()
+
+    def close(self):
+        """Stop the workers, only waiting for the jobs already started."""
+        self.cancel()
+        self.pool.shutdown(cancel_futures=True)
@@ -0,0 +1,64 @@
+"""Bit helpers: rows or columns of a board packed into integer masks."""
+
+from typing import Iterator
+
+
+def runs(mask: int) -> Iterator[tuple[int, int]]:
+    """Yield the runs of set bits of a mask as (first, last) pairs."""
+    starts = mask & ~(mask << 1)
+    ends = mask & ~(mask >> 1)
+    while starts:
+        first = (starts & -starts).bit_length() - 1
+        last = (ends & -ends).bit_length() - 1
+        starts &= starts - 1
+        ends &= ends - 1
+        yield first, last
+
+
+def components(masks: list[int]) -> list[list[tuple[int, int, int]]]:
+    """Group the set bits of line masks into 8-connected components of runs."""
+    parent: list[int] = []
+    found: list[tuple[int, int, int]] = []  # (line, first, last) of each run
+
+    def find(i: int) -> int:
+        """Find the root of a run."""
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    previous: list[tuple[int, int, int]] = []  # runs of the last line
+    for x, mask in enumerate(masks):
+        current, p = [], 0
+        for first, last in runs(mask):
+            i = len(parent)
+            parent.append(i)
+            found.append((x, first, last))
+            while p < len(previous) and previous[p][2] + 1 < first:
+                p += 1  # runs are ascending, skip the ones far above
+            for j, pf, pl in previous[p:]:
+                if pf > last + 1:
+                    break
+                parent[find(j)] = find(i)  # touching runs of neighbour lines
+            current.append((i, first, last))
+        previous = current
+
+    groups: dict[int, list[tuple[int, int, int]]] = {}
+    for i, run in enumerate(found):
+        groups.setdefault(find(i), []).append(run)
+    return list(groups.values())
+
+
+def span(first: int, last: int) -> int:
+    """Get a mask with bits from first to last set."""
+    return ((1 << (last - first + 1)) - 1) << first
+
+
+def dilate(masks: list[int]) -> list[int]:
+    """Dilate line masks by one bit in every direction (unbounded on the top)."""
+    spread = [mask | mask << 1 | mask >> 1 for mask in masks]
+    return [
+        spread[i] | (spread[i - 1] if i > 0 else 0) |
+        (spread[i + 1] if i + 1 < len(spread) else 0)
+        for i in range(len(spread))
+    ]
@@ -2,6 +2,13 @@
 
 from .tile import Tile
 from .stats import *
+from .frontier import Frontier
+from .probability import Probability
+from .logic import Logic
+from .zini import zini, hzini, neighbour_table
+from .history import History, pack, unpack
+from .generation import first_click_area, neighbours
+from array import array
 from typing import Iterator
 
 import random
@@ -20,6 +27,9 @@ class Board(object):
         self.mines: int = self.opts.mines  # mines
         self.init_tiles()
         self.set_tile_neighbours()
+        self.frontier = Frontier(self)
+        self.probability = Probability(self.frontier)
+        self.logic = Logic(self.frontier)
         self.init()
 
     def xy_index(self, x: int, y: int) -> int:
@@ -52,12 +62,17 @@ class Board(object):
         if itself:
             yield self.get_tile(x, y)
 
+    def get_area(self, x0: int, y0: int, x1: int, y1: int) -> Iterator[Tile]:
+        """Get tiles inside a rectangle area [x0, x1) x [y0, y1) of the board."""
+        for x in range(max(0, x0), min(self.width, x1)):
+            yield from self.tiles[self.xy_index(x, max(0, y0)):self.xy_index(
+                x, min(self.height, y1))]
+
     def set_tile_neighbours(self):
         """Set a tile's neighbours."""
-        for tile in self.tiles:
-            x, y = tile.get_coordinate()
-            neighbours = self.get_neighbours(x, y)
-            tile.set_neighbours(neighbours)
+        for i, tile in enumerate(self.tiles):
+            tile.set_neighbours(self.tiles[j] for j in neighbours(
+                self.width, self.height, i))
 
     def init(self):
         """Initialize the board."""
@@ -66,6 +81,11 @@ class Board(object):
         self.stats = [0 for _ in range(stats_count)]
         self.marker = [[] for _ in range(self.tile_count)]
         self.op_is_counter = [0 for _ in range(self.tile_count)]
+        self.frontier.init()
+        self.logic.init()
+        self.states = bytearray(self.tile_count)  # logged state of each tile
+        self.history = History()
+        self.held: set[Tile] = set()  # pressed tiles
 
     def init_tiles(self):
         """Initialize tiles."""
@@ -74,15 +94,50 @@ class Board(object):
         ]
 
     def set_mines(self, x, y):
-        """Set mines for the board."""
-        mine_field = [
-            i for i in range(self.tile_count) if i != self.xy_index(x, y)
-        ]
-        random.shuffle(mine_field)  # shuffle the field
+        """Set mines for the board, sampled outside the area of the first click."""
+        area = first_click_area(self.width, self.height, self.mines,
+                                self.xy_index(x, y), self.opts.first_click,
+                                self.opts.opening_size)
+        mine_field = [i for i in range(self.tile_count) if i not in area]
 
-        for i in mine_field[:self.mines]:
+        for i in random.sample(mine_field, self.mines):
             self.tiles[i].set_mine()  # toggle mine value
 
+    def get_mines(self) -> list[int]:
+        """Get indices of the mines of the board."""
+        return [i for i, t in enumerate(self.tiles) if t.is_mine()]
+
+    def load_mines(self, mines: Iterator[int]):
+        """Load mines from their indices."""
+        for i in mines:
+            self.tiles[i].set_mine()
+
+    def get_layout(self) -> tuple[int]:
+        """Get the mine layout of the board to be saved."""
+        return tuple(self.get_mines())
+
+    def load_layout(self, layout: tuple[int]):
+        """Load a saved mine layout."""
+        self.load_mines(layout)
+
+    def get_states(self) -> bytes:
+        """Get a copy of the state bits of every tile."""
+        return bytes(self.states)
+
+    def load_states(self, states: bytes):
+        """Load the state bits of every tile, as if they were opened or flagged."""
+        delta = array('i', (pack(i, 0, s) for i, s in enumerate(states) if s))
+        self.travel(delta, True)
+        self._update_finished()
+        self._update_blasted()
+
+    def clear_tiles(self):
+        """Clear the mines and states of all tiles, reusing the board."""
+        for tile in self.tiles:
+            tile.value = 0
+            tile.recover()
+        self.init()
+
     def recover_tiles(self):
         """Recover all of the tiles to COVERED in a board."""
         for tile in self.tiles:
@@ -90,9 +145,10 @@ class Board(object):
         self.init()
 
     def release(self):
-        """Handle release event from upper layer."""
-        for tile in self.tiles:
+        """Handle release event from upper layer, unholding the pressed tiles."""
+        for tile in self.held:
             tile.unhold()
+        self.held = set()
 
     def _update_finished(self):
         """Update whether the board is finished."""
@@ -127,22 +183,84 @@ class Board(object):
             """Wrap board_operate method."""
             self.release()
             changed_tiles = set()
+            before = (self.finish, self.blast)
             if self.in_board(x, y):
                 changed_tiles = func(self, self.xy_index(x, y), *args)
 
             if changed_tiles:
+                self.frontier.update(changed_tiles)
                 self.calc_in_game_stats(changed_tiles, replay)
 
                 # update the game status (finish / blast)
                 self._update_finished()
                 self._update_blasted(changed_tiles)
 
+                self.log(changed_tiles, before)
                 if self.is_ended() and not replay:
                     self.calc_finish_stats()
             return changed_tiles
 
         return inner
 
+    def log(self, changed_tiles: set[Tile], before: tuple):
+        """Log the changes of an operation into the history."""
+        delta = array('i')
+        for t in changed_tiles:
+            index = self.tile_index(t)
+            new = t.get_state()
+            if self.states[index] != new:
+                delta.append(pack(index, self.states[index], new))
+                self.states[index] = new
+        if delta:
+            self.history.push(delta, before, (self.finish, self.blast))
+
+    def travel(self, delta: array, forward: bool) -> set[Tile]:
+        """Apply the states of a logged step, forwards (redo) or backwards (undo)."""
+        changed_tiles = set()
+        for entry in delta:
+            index, old, new = unpack(entry)
+            tile = self.tiles[index]
+            if not forward:
+                old, new = new, old  # move from the new state to the old one
+            tile.set_state(new)
+            self.states[index] = new
+            self.stats[STATS.flags] += (new >> 1) - (old >> 1)
+            if (old ^ new) & 1 and not tile.is_mine():
+                self.solve_tile(tile, not tile.covered)
+            changed_tiles.add(tile)
+        self.stats[STATS.mines_left] = self.mines - self.stats[STATS.flags]
+        self.frontier.update(changed_tiles)
+        # the changed constraints are rechecked by the next refresh
+        self.logic.forget(self.tile_index(t) for t in changed_tiles)
+        return changed_tiles
+
+    def undo(self) -> set[Tile]:
+        """Undo the last logged operation, returning the changed tiles."""
+        step = self.history.undo()
+        if step is None:
+            return set()
+        delta, before, _ = step
+        self.finish, self.blast = before
+        return self.travel(delta, False)
+
+    def redo(self) -> set[Tile]:
+        """Redo the next logged operation, returning the changed tiles."""
+        step = self.history.redo()
+        if step is None:
+            return set()
+        delta, _, after = step
+        self.finish, self.blast = after
+        return self.travel(delta, True)
+
+    def jump(self, position: int) -> set[Tile]:
+        """Jump to a position of the history, returning the changed tiles."""
+        changed_tiles = set()
+        while self.history.position > position:
+            changed_tiles |= self.undo()
+        while self.history.position < min(position, len(self.history.steps)):
+            changed_tiles |= self.redo()
+        return changed_tiles
+
     @board_operate
     def left(self, index: int, BFS: bool) -> set():
         """Handle left click event from upper layer."""
@@ -162,17 +280,62 @@ class Board(object):
     def left_hold(self, index) -> set():
         """Handle left hold event from upper layer."""
         self.tiles[index].left_hold()
+        self.held.add(self.tiles[index])
         return set()
 
     @board_operate
     def double_hold(self, index) -> set():
         """Handle double hold event from upper layer."""
         self.tiles[index].double_hold()
+        self.held.add(self.tiles[index])
+        self.held.update(self.tiles[index].get_neighbours())
         return set()
 
-    def output(self):
-        """Output coordinate and status of all tiles inside a board."""
-        return [(t.x, t.y, t.status) for t in self.tiles]
+    def probabilities(self) -> list[float]:
+        """Get the mine probability of each tile (1-D index) for the visible state."""
+        return self.probability.compute()
+
+    def values(self) -> bytes:
+        """Get the values of the tiles (9 for mines) in reading order."""
+        return bytes(9 if t.is_mine() else t.value for y in range(self.height)
+                     for t in self.tiles[y::self.height])
+
+    def zini(self) -> int:
+        """Get the ZiNi of the board, chording the highest premium first."""
+        return zini(self.values(), neighbour_table(self.height, self.width))
+
+    def hzini(self) -> int:
+        """Get the HZiNi of the board, chording in reading order."""
+        return hzini(self.values(), neighbour_table(self.height, self.width))
+
+    def hint(self) -> int:
+        """Get a covered tile (1-D index) deduced safe by logic, or None."""
+        return self.logic.hint()
+
+    def status(self, index: int) -> int:
+        """Get the status of a tile for upper layer."""
+        return self.tiles[index].status
+
+    def update_tiles(self, tiles: Iterator[Tile]):
+        """Update status of tiles."""
+        for tile in tiles:
+            tile.update()
+
+    def update_finish(self):
+        """Update status of tiles after finishing a game."""
+        for tile in self.tiles:
+            tile.update_finish()
+
+    def update_blast(self):
+        """Update status of tiles after failing a game."""
+        for tile in self.tiles:
+            tile.update_blast()
+
+    def output(self, tiles: Iterator[Tile] = None):
+        """Output coordinate and status of tiles (all tiles by default)."""
+        if tiles is None:
+            tiles = self.tiles
+        return [(t.x, t.y, t.status) for t in tiles]
 
     def calc_basic_stats(self):
         """Calculate basic statistics."""
@@ -212,16 +375,7 @@ class Board(object):
                 if t.covered or t.is_mine():
                     continue
                 else:
-                    for temp_index in self.marker[self.tile_index(t)]:
-                        self.op_is_counter[temp_index] -= 1
-                        if temp_index < 0:
-                            self.stats[STATS.solved_BBBV] += 1
-                            if self.op_is_counter[temp_index] == 0:
-                                self.stats[STATS.solved_IS] += 1
-                        else:
-                            if self.op_is_counter[temp_index] == 0:
-                                self.stats[STATS.solved_OP] += 1
-                                self.stats[STATS.solved_BBBV] += 1
+                    self.solve_tile(t, True)
 
     def calc_finish_stats(self):
         """Calculate statistics after the game is ended."""
@@ -233,16 +387,23 @@ class Board(object):
             if t.covered or t.is_mine():
                 continue
             else:
-                for temp_index in self.marker[self.tile_index(t)]:
-                    self.op_is_counter[temp_index] -= 1
-                    if temp_index < 0:
-                        self.stats[STATS.solved_BBBV] += 1
-                        if self.op_is_counter[temp_index] == 0:
-                            self.stats[STATS.solved_IS] += 1
-                    else:
-                        if self.op_is_counter[temp_index] == 0:
-                            self.stats[STATS.solved_OP] += 1
-                            self.stats[STATS.solved_BBBV] += 1
+                self.solve_tile(t, True)
+
+    def solve_tile(self, tile: Tile, opened: bool):
+        """Count an opened tile into solved statistics, or take it back."""
+        for temp_index in self.marker[self.tile_index(tile)]:
+            if opened:
+                self.op_is_counter[temp_index] -= 1
+            if temp_index < 0:
+                self.stats[STATS.solved_BBBV] += 1 if opened else -1
+                if self.op_is_counter[temp_index] == 0:
+                    self.stats[STATS.solved_IS] += 1 if opened else -1
+            else:
+                if self.op_is_counter[temp_index] == 0:
+                    self.stats[STATS.solved_OP] += 1 if opened else -1
+                    self.stats[STATS.solved_BBBV] += 1 if opened else -1
+            if not opened:
+                self.op_is_counter[temp_index] += 1
 
     def __repr__(self):
         """Print the board's status."""
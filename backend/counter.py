@@ -28,9 +28,9 @@ class Counter():
         """Get the game elapsed time."""
         return max(self.game_time, 0.0)
 
-    def start_timer(self):
-        """Start the timer."""
-        self.start_ns_time = timer()
+    def start_timer(self, elapsed=0.0):
+        """Start the timer, or resume it from some elapsed seconds."""
+        self.start_ns_time = timer() - round(elapsed / NS2S)
         self.active = True
         self.refresh_timer()
 
@@ -0,0 +1,200 @@
+"""Efficiency: live efficiency metrics of a game, as the analyzer gets them.
+
+The actions of a game are mapped onto the opcodes of the analyzer: left
+clicks (0), right clicks (1), double clicks (4), and holds and moves (5) as
+positions of the mouse. Each action is applied as `_analyzer.Record` applies
+it to its blocks, so the metrics of a game in progress are the ones of its
+record analyzed so far, and they are the final ones once the game is over.
+
+An action costs a few steps, except for the blocks it opens, which are only
+opened once in a game.
+"""
+
+from .zini import neighbour_table
+
+import math
+
+MINE = 9  # value of a mine
+OPCODES = {
+    'left': 0,
+    'right': 1,
+    'double': 4,
+    'left_hold': 5,
+    'double_hold': 5,
+    'move': 5,
+}  # operations of a game and the opcodes of the analyzer
+
+
+def milliseconds(time: float) -> int:
+    """Get the time of an action of the analyzer."""
+    return round(time * 1000)
+
+
+def divide(a: float, b: float) -> float:
+    """Divide as the analyzer does, without throwing a ZeroDivisionError."""
+    try:
+        return a / b
+    except ZeroDivisionError:
+        return 0.0 if a == 0 else math.inf
+
+
+def record_actions(actions: list[tuple[float, str, int, int]], width: int,
+                   height: int) -> list[list]: # yapf: disable
+    """Convert the (time, op, x, y) actions of a game into actions of the analyzer."""
+    return [[OPCODES[op], y, x, milliseconds(time)]
+            for time, op, x, y in actions
+            if op in OPCODES and 0 <= x < width and 0 <= y < height]
+
+
+def count_bbbv(grid: bytes, table: tuple[tuple[int]]) -> int:
+    """Count the 3BV of a board: its openings and the numbers away from them."""
+    seen, bbbv = bytearray(len(grid)), 0
+    for start, value in enumerate(grid):
+        if value == 0 and not seen[start]:
+            bbbv += 1
+            seen[start] = 1
+            stack = [start]
+            while stack:
+                for j in table[stack.pop()]:
+                    if grid[j] == 0 and not seen[j]:
+                        seen[j] = 1
+                        stack.append(j)
+        elif 0 < value < MINE and all(grid[j] for j in table[start]):
+            bbbv += 1
+    return bbbv
+
+
+class Efficiency(object):
+    """Efficiency: live efficiency metrics of a game, as the analyzer gets them."""
+
+    def __init__(self, grid: bytes, rows: int, columns: int, bbbv: int = None):
+        """Start from a covered board of values (9 for mines) in reading order."""
+        self.grid: bytes = grid
+        self.rows: int = rows
+        self.columns: int = columns
+        self.table: tuple[tuple[int]] = neighbour_table(rows, columns)
+        self.bbbv: int = count_bbbv(grid, self.table) if bbbv is None else bbbv
+        # 1 opened, -1 flagged, -2 blasted, -3 misflagged and found by a chord
+        self.marker: list[int] = [0] * len(grid)
+        self.checked: bytearray = bytearray(len(grid))  # zeros of checked openings
+        self.last: tuple[int, int] = None  # position of the last action
+        self.ms: int = 0  # time of the last action
+        self.path: float = 0.0
+        self.cl: int = 0
+        self.ce: int = 0
+        self.solved_bv: int = 0
+        self.solved_op: int = 0
+        self.flags: int = 0
+        self.unflags: int = 0
+        self.misflags: int = 0
+        self.misunflags: int = 0
+
+    def add(self, time: float, op: str, x: int, y: int):
+        """Apply an action of a game."""
+        opcode = OPCODES.get(op)
+        if opcode is None or not (0 <= x < self.columns and 0 <= y < self.rows):
+            return
+        row, col = y, x
+        self.ms = milliseconds(time)
+        if self.last is not None:
+            last_row, last_col = self.last
+            self.path += math.sqrt((row - last_row)**2 + (col - last_col)**2)
+        self.last = (row, col)
+        index = row * self.columns + col
+        if opcode == 0:
+            self.cl += 1
+            self.ce += self.click(index)
+        elif opcode == 1:
+            self.cl += 1
+            self.ce += self.flag(index)
+        elif opcode == 4:
+            self.cl += 1
+            self.ce += self.chord(index)
+
+    def click(self, index: int) -> bool:
+        """Open a block, getting whether the click is effective."""
+        grid, marker, table = self.grid, self.marker, self.table
+        if marker[index] != 0:
+            return False
+        if grid[index] == MINE:
+            marker[index] = -2
+        elif grid[index] == 0:
+            marker[index] = 1
+            stack = [index]
+            while stack:
+                i = stack.pop()
+                if grid[i] == 0:
+                    for j in table[i]:
+                        if marker[j] == 0:
+                            marker[j] = 1
+                            stack.append(j)
+            opened = self.fully_opened(index)
+            self.solved_bv += opened
+            self.solved_op += opened
+        else:
+            # bv is added when the click is not on the edge of an opening
+            self.solved_bv += all(grid[j] for j in table[index])
+            marker[index] = 1
+        return True
+
+    def fully_opened(self, index: int) -> bool:
+        """Check whether the opening of a zero is fully opened."""
+        grid, marker, table, checked = (self.grid, self.marker, self.table,
+                                        self.checked)
+        checked[index] = 1
+        stack = [index]
+        while stack:
+            i = stack.pop()
+            if marker[i] != 1:
+                return False
+            for j in table[i]:
+                if grid[j] == 0 and not checked[j]:
+                    checked[j] = 1
+                    stack.append(j)
+        return True
+
+    def flag(self, index: int) -> bool:
+        """Flag or unflag a block, which is always effective."""
+        marker, mine = self.marker, self.grid[index] == MINE
+        if marker[index] == 0:
+            self.flags += 1
+            marker[index] = -1
+            self.misflags += not mine
+        elif marker[index] == -1:
+            self.flags -= 1
+            marker[index] = 0
+            self.misunflags += mine
+            self.unflags += not mine
+        return True
+
+    def chord(self, index: int) -> bool:
+        """Chord a block, getting whether the chord is effective."""
+        grid, marker = self.grid, self.marker
+        around = self.table[index]
+        flagged = [j for j in around if marker[j] == -1]
+        unopened = [j for j in around if marker[j] == 0]
+        if len(flagged) != grid[index] or not flagged or not unopened:
+            return False
+        for j in unopened:
+            self.click(j)
+        for j in flagged:
+            marker[j] -= 2 * (grid[j] != MINE)
+        return True
+
+    def result(self, time: float = None) -> dict:
+        """Get the metrics by a time, or by the last action if not given."""
+        rtime = self.ms / 1000 if time is None else time
+        solved_bv, ce, cl = self.solved_bv, self.ce, self.cl
+        return {
+            'path': self.path,
+            'cl': cl,
+            'ce': ce,
+            'solved_bv': solved_bv,
+            'bvs': divide(solved_bv, rtime),
+            'ces': divide(ce, rtime),
+            'corr': divide(ce - self.misflags - self.unflags - self.misunflags
+                           - (self.bbbv != solved_bv), cl), # yapf: disable
+            'thrp': divide(solved_bv, ce),
+            'ioe': divide(solved_bv, cl),
+            'iome': divide(solved_bv, self.path),
+        }
@@ -0,0 +1,68 @@
+"""Feed: a versioned feed of the status changes of a board."""
+
+from .tile import Tile
+from array import array
+from typing import Iterator
+
+import re
+
+STATUS_OFFSET = 4  # shift statuses (-4 to 11) to fit into 4 bits
+FEED_MIN = 1024  # least changes kept in a feed
+FEED_MAX = 1 << 16  # most changes kept in a feed
+UNKNOWN = 0xFF  # published status of every tile after a reset
+
+
+class Feed(object):
+    """Feed: a versioned feed of the status changes of a board."""
+
+    def __init__(self, tile_count: int, statuses: bool = True):
+        """Initialize an empty feed for a board of covered tiles, keeping their statuses if asked."""
+        # published statuses, or none for a huge board, one byte per tile being
+        # too much there
+        self.statuses: bytearray = bytearray(
+            (Tile.COVERED + STATUS_OFFSET, )) * (tile_count if statuses else 0)
+        self.capacity: int = min(FEED_MAX, max(FEED_MIN, 2 * tile_count))
+        # a ring buffer of (index << 4 | status), which is never resized
+        self.entries: array = array('i', bytes(4 * self.capacity))
+        self.view: memoryview = memoryview(self.entries)
+        self.version: int = 0  # number of changes ever published
+
+    def publish(self, board: any, tiles: Iterator):
+        """Publish the tiles of a board whose statuses have changed, or all without statuses kept."""
+        statuses, entries, capacity = self.statuses, self.entries, self.capacity
+        version, kept = self.version, bool(statuses)
+        for tile in tiles:
+            index = board.tile_index(tile)
+            status = board.status(index) + STATUS_OFFSET
+            if kept:
+                if statuses[index] == status:
+                    continue
+                statuses[index] = status
+            entries[version % capacity] = index << 4 | status
+            version += 1
+        self.version = version
+
+    def reset(self):
+        """Drop every change, so that readers take the whole board again."""
+        self.statuses[:] = bytes((UNKNOWN, )) * len(self.statuses)
+        self.version += self.capacity + 1
+
+    def shown(self) -> list[int]:
+        """Get the indices of the tiles published as not covered."""
+        return differing(self.statuses, Tile.COVERED + STATUS_OFFSET)
+
+    def since(self, version: int) -> tuple[memoryview, memoryview]:
+        """Get the changes after a version as two views, or None if overwritten."""
+        count = self.version - version
+        if not 0 <= count <= self.capacity:
+            return None
+        start, end = version % self.capacity, self.version % self.capacity
+        if count == 0 or start < end:
+            return self.view[start:start + count], self.view[:0]
+        return self.view[start:], self.view[:end]
+
+
+def differing(buffer: bytes, value: int) -> list[int]:
+    """Get the indices of the bytes of a buffer other than a value."""
+    pattern = re.compile(b'[^' + re.escape(bytes((value, ))) + b']')
+    return [match.start() for match in pattern.finditer(buffer)]
@@ -0,0 +1,66 @@
+"""Frontier: the revealed numbers of a board and the covered tiles around them."""
+
+from .tile import Tile
+from typing import Iterable
+
+
+class Frontier(object):
+    """Frontier: the revealed numbers of a board and the covered tiles around them."""
+
+    def __init__(self, board: any):
+        """Initialize a frontier."""
+        self.board: any = board
+        self.init()
+
+    def init(self):
+        """Initialize the frontier for a new game."""
+        self.constraints: dict[int, tuple[frozenset[int], int]] = {}
+        self.opened: set[int] = set()  # indices of uncovered tiles
+        self.known_mines: set[int] = set()  # indices of uncovered mines
+        self.changed: set[int] = set()  # indices of changed constraints, if any
+
+    def covered_count(self) -> int:
+        """Get the number of covered tiles."""
+        return self.board.tile_count - len(self.opened)
+
+    def mines_left(self) -> int:
+        """Get the number of mines which are still covered."""
+        return self.board.mines - len(self.known_mines)
+
+    def _constraint(self, tile: Tile):
+        """Get the constraint given by a tile, or None if it gives nothing."""
+        if tile.covered or tile.is_mine():
+            return None
+        cells, value = [], tile.value
+        for t in tile.get_neighbours():
+            if t.covered:
+                cells.append(self.board.tile_index(t))
+            elif t.is_mine():
+                value -= 1  # an uncovered mine is not unknown any more
+        return (frozenset(cells), value) if cells else None
+
+    def update(self, changed_tiles: Iterable[Tile]):
+        """Update the constraints around the changed tiles."""
+        affected = set()
+        for tile in changed_tiles:
+            index = self.board.tile_index(tile)
+            if tile.covered:
+                self.opened.discard(index)
+                self.known_mines.discard(index)
+            else:
+                self.opened.add(index)
+                if tile.is_mine():
+                    self.known_mines.add(index)
+            affected.add(tile)
+            affected.update(tile.get_neighbours())
+
+        for tile in affected:
+            index = self.board.tile_index(tile)
+            constraint = self._constraint(tile)
+            if self.constraints.get(index) == constraint:
+                continue
+            self.changed.add(index)
+            if constraint is None:
+                del self.constraints[index]
+            else:
+                self.constraints[index] = constraint
@@ -3,67 +3,181 @@
 from .tile import Tile
 from .counter import Counter
 from .board import Board
+from .huge import HugeBoard
+from .feed import Feed, differing
+from .efficiency import Efficiency, record_actions
+from .background import BASIC, basic, analyze
+from .layout import to_rows, flags_of
+from .stats import STATS
+from .zini import neighbour_table
+from typing import Iterator
+
+ACTIONS_TAIL = 4096  # recent actions kept in a snapshot, moves aside
 
 
 class Game(object):
     """Game: upper layer to communicate with UI and board."""
 
-    def __init__(self, settings: any):
-        """Initialize a game."""
+    def __init__(self, settings: any, store: any = None, mirror: any = None,
+                 background: any = None): # yapf: disable
+        """Initialize a game, with a store, a mirror and a background pool if any."""
         self.opts: any = settings
+        self.store: any = store
+        self.mirror: any = mirror
+        self.background: any = background
         self.init()
 
     def init(self):
         """Initialize the board and counter."""
-        self.board = Board(self.opts)
+        self.settle()
+        if self.opts.huge:
+            self.board = HugeBoard(self.opts)
+        elif self.reusable():
+            self.board.clear_tiles()  # building the tiles costs much more
+        else:
+            self.board = Board(self.opts)
+        if isinstance(self.board, Board):
+            # built once for a size, before the first click needs it
+            neighbour_table(self.board.height, self.board.width)
         self.first: bool = True
         self.win: bool = False
         self.lose: bool = False
         self.upk: bool = False
         self.stable: bool = False
-        self.recently_updated: list[Tile] = self.board.tiles.copy()
+        self.recently_updated: set[Tile] = set()
         self.stats = self.board.stats
         self.counter: Counter = Counter(self.stats)
+        self.actions: list[tuple[float, str, int, int]] = []  # (time, op, x, y)
+        self.moves: list[tuple[int, float, int, int]] = []  # (actions before, time, x, y)
+        self.replayable: bool = True  # whether the actions replay the whole game
+        # changes of tile statuses, without a byte per tile for a huge board
+        self.feed: Feed = Feed(self.board.tile_count,
+                               isinstance(self.board, Board))
+        self.efficiency: Efficiency = None  # analyzer metrics, once mines are set
+        self.pending: bool = False  # basic statistics computed in the background
+        self.analysis: dict = None  # analysis of the game once finished
+        self.cancel()
+        self.share()
+
+    def reusable(self) -> bool:
+        """Check whether the board could be reused for a new game."""
+        board = getattr(self, 'board', None)
+        return isinstance(board, Board) and (
+            board.width, board.height, board.mines) == (
+                self.opts.width, self.opts.height, self.opts.mines)
 
     def set_mines(self, x, y):
         """Set mines for the board."""
         if not self.upk:
             # don't need to update the mine field when it is UPK mode
             self.board.set_mines(x, y)
-        # self.board.calc_basic_stats()
 
     def init_upk(self):
         """Toggle UPK mode."""
+        self.settle()
+        shown = self.feed.shown()  # covered again
         self.board.recover_tiles()
         self.first = True
         self.win = False
         self.lose = False
         self.upk = True
         self.stable = False
-        self.recently_updated = self.board.tiles.copy()
+        self.recently_updated = set()
         self.stats = self.board.stats
         self.counter: Counter = Counter(self.stats)
+        self.actions = []
+        self.moves = []
+        self.replayable = True
+        self.efficiency = None
+        self.pending = False
+        self.analysis = None
+        self.cancel()
+        self.publish_tiles(shown)
+        self.share()
+
+    def load_mines(self, mines):
+        """Load a known mine field, which is kept as in UPK mode."""
+        self.board.load_mines(mines)
+        self.upk = True
+
+    def kind(self) -> tuple:
+        """Get the kind of the board: mode, huge, height, width and mines."""
+        return (self.opts.mode, self.opts.huge, self.opts.height,
+                self.opts.width, self.opts.mines)
+
+    def in_progress(self) -> bool:
+        """Check whether the game is started and not ended."""
+        return not (self.first or self.win or self.lose)
+
+    def snapshot(self) -> tuple:
+        """Take a snapshot of the game, copying only a few small buffers."""
+        return (self.kind(), self.upk, self.counter.get_time(),
+                tuple(self.stats), self.board.get_layout(),
+                self.board.get_states(),
+                len(self.actions) if self.replayable else -1,  # never a tail
+                tuple(self.actions[-ACTIONS_TAIL:]))
+
+    def restore(self, snapshot: tuple) -> bool:
+        """Restore the game from a snapshot of the same kind of board."""
+        kind, upk, time, stats, layout, states, count, actions = snapshot
+        if tuple(kind) != self.kind():
+            return False
+        self.init()
+        self.board.load_layout(layout)
+        self.board.calc_basic_stats()
+        self.board.load_states(states)
+        self.stats[:] = stats
+        self.upk = upk
+        self.first = False
+        self.actions = list(actions)  # without moves, only shortening the path
+        # a truncated or unfaithful log can not be replayed from the beginning
+        self.replayable = count == len(actions)
+        self.track()
+        self.counter.start_timer(time)
+        if self.board.is_ended():
+            self.end()
+        else:
+            self.board.update_tiles(
+                self.board.get_area(0, 0, self.board.width, self.board.height))
+        # the tiles opened or flagged, as the feed starts covered
+        self.publish_tiles(
+            differing(self.board.states, 0) if isinstance(
+                self.board, Board) else ()) # yapf: disable
+        self.share()
+        return True
 
     def start(self, x, y):
         """Start the game."""
         # while not self.valid_bv:
         self.set_mines(x, y)
+        if self.background is not None and isinstance(self.board, Board):
+            self.pending = True
+            self.background.submit('basic', basic, self.job())
+        else:
+            self.board.calc_basic_stats()
+            self.track()
+        self.publish_tiles(self.feed.shown())  # flagged before, recovered
         self.counter.start_timer()
         self.first = False
 
-    def end(self):
-        """End the game."""
+    def end(self, changed_tiles: Iterator = ()):
+        """End the game, publishing the tiles changed by its last step."""
         self.counter.stop_timer()
         if self.board.is_blasted():
             self.stable = False
             self.lose = True
-            for tile in self.board.tiles:
-                tile.update_blast()
+            self.board.update_blast()
         elif self.board.is_finished():
             self.stable = False
             self.win = True
-            for tile in self.board.tiles:
-                tile.update_finish()
+            self.board.update_finish()
+        if isinstance(self.board, Board):
+            self.feed.publish(self.board, changed_tiles)
+            # besides, only mines and flags are shown differently once ended
+            self.publish_tiles(
+                set(self.board.get_mines()) | set(self.feed.shown()))
+        else:
+            self.feed.reset()
 
     def operate(func):
         """Handle mouse event from upper layer."""
@@ -71,24 +185,39 @@ class Game(object):
         def inner(self, x: float = -5.0, y: float = -5.0):
             if self.win or self.lose:
                 return
+            held = self.board.held  # replaced by a new set once released
             changed_tiles, button = func(self, int(x), int(y),
                                          replay=True)  # The real operation
             self.counter.refresh(changed_tiles, button)
-            pending_tiles = changed_tiles | set(
-                self.board.get_neighbours(x, y, radius=2, itself=True))
+            if func.__name__ != 'nothing':
+                self.actions.append(
+                    (self.counter.get_time(), func.__name__, int(x), int(y)))
+                if self.efficiency is not None:
+                    self.efficiency.add(*self.actions[-1])
             # self.save_MouseTrack
             # ...
             # print(self.stats)
-            if self.board.is_ended():
-                self.end()
-            else:
-                self.stable = True
-                for tile in pending_tiles:
-                    tile.update()
-                self.recently_updated = pending_tiles
+            self.advance(changed_tiles, held)
 
         return inner
 
+    def advance(self, changed_tiles: set, held: set):
+        """Update and publish the tiles changed by a step, ending the game if it is over."""
+        # only the changed, released and pressed tiles need updating
+        pending_tiles = changed_tiles | held | self.board.held
+        if self.board.is_ended():
+            self.end(pending_tiles)
+            if not self.pending:
+                self.conclude()
+        else:
+            self.stable = True
+            self.board.update_tiles(pending_tiles)
+            self.recently_updated = pending_tiles
+            self.feed.publish(self.board, pending_tiles)
+            if changed_tiles and isinstance(self.board, Board):
+                self.board.logic.refresh()  # hints are lookups then
+        self.share()
+
     @operate
     def left(self, x, y, **kwargs):
         """Handle left click."""
@@ -131,13 +260,224 @@ class Game(object):
         """Regularly refresh the counter."""
         return set(), Counter.OTHERS
 
-    def board_output(self, forced_whole_board=False):
-        """Output the board."""
+    def move(self, x, y):
+        """Record a move of the mouse onto a tile."""
+        if self.win or self.lose:
+            return
+        self.counter.refresh_timer()
+        time = self.counter.get_time()
+        self.moves.append((len(self.actions), time, int(x), int(y)))
+        if self.efficiency is not None:
+            self.efficiency.add(time, 'move', int(x), int(y))
+
+    def played(self) -> Iterator[tuple[float, str, int, int]]:
+        """Get the actions of the game with the moves between them, as played."""
+        moves = iter(self.moves)
+        move = next(moves, None)
+        for i, action in enumerate(self.actions):
+            while move is not None and move[0] <= i:
+                yield (move[1], 'move', move[2], move[3])
+                move = next(moves, None)
+            yield action
+        while move is not None:
+            yield (move[1], 'move', move[2], move[3])
+            move = next(moves, None)
+
+    def track(self, values: bytes = None, bbbv: int = None):
+        """Track the efficiency of the game from its actions, once mines are set."""
+        board = self.board
+        if isinstance(board, Board) and self.replayable:
+            self.efficiency = Efficiency(
+                board.values() if values is None else values, board.height,
+                board.width, bbbv)
+            for action in self.played():
+                self.efficiency.add(*action)
+
+    def unrecord(self):
+        """Give up the log of a game changed by other means than its actions."""
+        self.replayable = False
+        self.efficiency = None  # its metrics follow the actions only
+
+    def conclude(self):
+        """Record a finished game, and analyze it in the background if possible."""
+        if self.store is not None:
+            self.store.record(self)
+        if (self.background is not None and self.replayable
+                and isinstance(self.board, Board)):
+            self.background.submit(
+                'analysis', analyze,
+                self.job(self.board.get_states(), list(self.played())))
+
+    def job(self, *args) -> tuple:
+        """Get a job of the background: the size and mines of the board, and more."""
+        board = self.board
+        return (board.width, board.height, board.get_layout(), *args)
+
+    def cancel(self):
+        """Cancel the background jobs of the previous game."""
+        if self.background is not None:
+            self.background.cancel()
+
+    def settle(self):
+        """Compute the basic statistics of a finished game still waiting for them."""
+        if getattr(self, 'pending', False) and (self.win or self.lose):
+            self.install(*basic(self.job()))
+
+    def receive(self, generation: int, name: str, result: any):
+        """Receive the result of a background job, unless it is outdated."""
+        if self.background is None or generation != self.background.generation:
+            return
+        if name == 'basic':
+            if isinstance(result, Exception):
+                result = basic(self.job())  # the worker failed, do it here
+            self.install(*result)
+        elif name == 'analysis' and not isinstance(result, Exception):
+            self.analysis = result
+
+    def install(self, stats: list[int], marker: list[list[int]],
+                counter: list[int], values: bytes): # yapf: disable
+        """Install the basic statistics computed in the background."""
+        board = self.board
+        for i, value in zip(BASIC, stats):
+            self.stats[i] = value
+        board.marker, board.op_is_counter = marker, counter
+        board.calc_finish_stats()  # solve the tiles opened in the meantime
+        self.track(values, self.stats[STATS.BBBV])
+        self.pending = False
+        if self.win or self.lose:
+            self.conclude()
+        self.share()
+
+    def export(self) -> tuple[list[str], list[list]]:
+        """Export the game as the board rows and actions of the analyzer."""
+        if not self.replayable:
+            raise ValueError('the actions do not replay the game')
+        board = self.board
+        return (to_rows(board.width, board.height,
+                        flags_of(board.tile_count, board.get_mines())),
+                record_actions(list(self.played()), board.width, board.height))
+
+    def hint(self) -> tuple[int, int]:
+        """Get a covered tile deduced safe by logic as (x, y), or None."""
+        if self.first or not isinstance(self.board, Board):
+            return None
+        index = self.board.hint()
+        return None if index is None else divmod(index, self.board.height)
+
+    def auto_flag(self) -> int:
+        """Flag the tiles deduced as mines by logic, getting how many are flagged."""
+        if (self.first or self.win or self.lose or self.opts.nf
+                or not isinstance(self.board, Board)):
+            return 0
+        board, changed_tiles, held = self.board, set(), self.board.held
+        mines = board.logic.mine_tiles()
+        for index in mines:
+            changed_tiles |= board.right(*divmod(index, board.height),
+                                         self.opts.easy_flag, replay=True)
+        self.automate(changed_tiles, held)
+        return len(mines)
+
+    def auto_open(self) -> int:
+        """Open the tiles deduced safe by logic until none is left, getting how many are opened."""
+        if self.first or self.win or self.lose:
+            return 0
+        board, changed_tiles, held = self.board, set(), self.board.held
+        count = 0
+        while not board.is_ended():
+            tile = self.hint()
+            if tile is None:
+                break
+            changed_tiles |= board.left(*tile, self.opts.bfs, replay=True)
+            count += 1
+        self.automate(changed_tiles, held)
+        return count
+
+    def automate(self, changed_tiles: set, held: set):
+        """Finish an automatic operation, which counts as no click of the player."""
+        self.counter.refresh_timer()
+        if changed_tiles:
+            self.unrecord()  # no action of the log tells it
+        self.advance(changed_tiles, held)
+
+    def time_travel(func):
+        """Handle moving through the history of the board."""
+
+        def inner(self, *args):
+            if not isinstance(self.board, Board):
+                return  # only a normal board keeps a history
+            if self.win or self.lose:
+                return  # a finished game is timed and recorded already
+            changed_tiles = func(self, *args)
+            if changed_tiles:
+                self.unrecord()  # the log goes on from another board
+            if self.board.is_ended():
+                self.end(changed_tiles)  # redone into the end, as if played
+                if not self.pending:
+                    self.conclude()
+            else:
+                self.stable = True
+                self.board.update_tiles(changed_tiles)
+                self.recently_updated = changed_tiles
+                self.feed.publish(self.board, changed_tiles)
+            self.share()
+
+        return inner
+
+    @time_travel
+    def undo(self):
+        """Undo the last operation."""
+        return self.board.undo()
+
+    @time_travel
+    def redo(self):
+        """Redo the next operation."""
+        return self.board.redo()
+
+    @time_travel
+    def jump(self, position):
+        """Jump to a position of the history."""
+        return self.board.jump(position)
+
+    def publish_tiles(self, indices: Iterator[int]):
+        """Publish the tiles of some indices, or reset the feed of a huge board."""
+        if isinstance(self.board, Board):
+            tiles = self.board.tiles
+            self.feed.publish(self.board, (tiles[i] for i in indices))
+        else:
+            self.feed.reset()  # readers take the whole board again
+
+    def share(self):
+        """Write the statistics into the mirror, if any."""
+        if self.mirror is not None:
+            self.mirror.write(self)
+
+    def changes(self, version: int) -> tuple[memoryview, memoryview]:
+        """Get the (index << 4 | status + 4) changes after a version, or None if lost."""
+        return self.feed.since(version)
+
+    def board_output(self, forced_whole_board=False, area=None):
+        """Output the board, or only the tiles inside an area (x0, y0, x1, y1)."""
         if self.stable and not forced_whole_board:
-            return [(t.x, t.y, t.status) for t in self.recently_updated]
+            return self.board.output(self.recently_updated)
+        elif area is not None:
+            return self.board.output(self.board.get_area(*area))
         else:
             return self.board.output()
 
+    def probability_output(self):
+        """Output the mine probabilities of the board, or none for a huge board."""
+        if not isinstance(self.board, Board):
+            return []  # solving a huge board at once is out of reach
+        probabilities = self.board.probabilities()
+        return [(t.x, t.y, p) for t, p in zip(self.board.tiles, probabilities)]
+
+    def efficiency_output(self) -> dict:
+        """Output the efficiency metrics (ioe, corr, thrp, path, ces...) so far."""
+        if self.efficiency is None:
+            return {}
+        return self.efficiency.result(
+            self.counter.get_time() if self.in_progress() else None)
+
     def time_output(self):
         """Output the time."""
         pass
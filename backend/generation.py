@@ -0,0 +1,45 @@
+"""First-click policies: the tiles kept free of mines around the first click."""
+
+from typing import Iterator
+
+import random
+
+POLICIES = ('safe', 'zero', 'opening')  # a safe tile, a zero, a large opening
+
+
+def neighbours(width: int, height: int, index: int) -> Iterator[int]:
+    """Get the indices of the neighbours of an index."""
+    x, y = divmod(index, height)
+    for i in range(max(0, x - 1), min(width, x + 2)):
+        for j in range(max(0, y - 1), min(height, y + 2)):
+            if i != x or j != y:
+                yield i * height + j
+
+
+def grow_opening(width: int, height: int, index: int, size: int) -> set[int]:
+    """Grow a random area of zeros from an index until it opens enough tiles."""
+    area = {index, *neighbours(width, height, index)}  # zeros and their edges
+    candidates = list(area - {index})  # edge tiles which could be zeros as well
+    while len(area) < size and candidates:
+        k = random.randrange(len(candidates))
+        candidates[k], candidates[-1] = candidates[-1], candidates[k]
+        tile = candidates.pop()  # the tile becomes a zero
+        for i in neighbours(width, height, tile):
+            if i not in area:
+                area.add(i)
+                candidates.append(i)
+    return area
+
+
+def first_click_area(width: int, height: int, mines: int, index: int,
+                     policy: str = 'safe', size: int = 0) -> set[int]: # yapf: disable
+    """Get the tiles to keep free of mines, falling back to a smaller area if too dense."""
+    areas = [{index}]
+    if policy in ('zero', 'opening'):
+        areas.append({index, *neighbours(width, height, index)})
+    if policy == 'opening':
+        areas.append(grow_opening(width, height, index, size))
+    for area in reversed(areas):
+        if width * height - len(area) >= mines:
+            return area
+    return areas[0]
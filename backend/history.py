@@ -0,0 +1,64 @@
+"""History: a log of board changes for undo, redo and time travel."""
+
+from array import array
+
+OPENED = 1  # state bit: the tile is opened
+FLAGGED = 2  # state bit: the tile is flagged
+COMPACT_LIMIT = 1024  # steps kept before the oldest half is compacted
+
+
+def pack(index: int, old: int, new: int) -> int:
+    """Pack the change of a tile into an entry."""
+    return index << 4 | old << 2 | new
+
+
+def unpack(entry: int) -> tuple[int, int, int]:
+    """Unpack an entry into the index, old state and new state of a tile."""
+    return entry >> 4, entry >> 2 & 3, entry & 3
+
+
+class History(object):
+    """History: a log of board changes for undo, redo and time travel."""
+
+    def __init__(self, limit: int = COMPACT_LIMIT):
+        """Initialize an empty history."""
+        self.limit: int = limit
+        self.steps: list[tuple[array, tuple, tuple]] = []  # delta, before, after
+        self.position: int = 0  # number of steps applied
+
+    def push(self, delta: array, before: tuple, after: tuple):
+        """Log a step, dropping the steps which could be redone."""
+        del self.steps[self.position:]
+        self.steps.append((delta, before, after))
+        self.position += 1
+        if len(self.steps) > self.limit:
+            self.compact(len(self.steps) // 2)
+
+    def compact(self, count: int):
+        """Merge the oldest steps into one, keeping the first and last states."""
+        if count < 2:
+            return
+        merged: dict[int, list[int]] = {}
+        for delta, _, _ in self.steps[:count]:
+            for entry in delta:
+                index, old, new = unpack(entry)
+                merged.setdefault(index, [old, new])[1] = new
+        delta = array('i', (pack(i, old, new)
+                            for i, (old, new) in merged.items() if old != new))
+        step = (delta, self.steps[0][1], self.steps[count - 1][2])
+        self.steps[:count] = [step]
+        self.position -= count - 1
+
+    def undo(self):
+        """Move back a step, returning it or None at the beginning."""
+        if self.position == 0:
+            return None
+        self.position -= 1
+        return self.steps[self.position]
+
+    def redo(self):
+        """Move forward a step, returning it or None at the end."""
+        if self.position == len(self.steps):
+            return None
+        self.position += 1
+        return self.steps[self.position - 1]
@@ -0,0 +1,379 @@
+"""HugeBoard: A board stored in lazily materialized chunks instead of tiles."""
+
+from .tile import Tile
+from .stats import *
+from .bits import runs, components, span, dilate
+from .generation import first_click_area
+from collections import deque
+from typing import Iterator
+
+import random
+import itertools
+
+CHUNK = 64  # side length of a chunk
+OPENED = 1  # state bit: the tile is opened
+FLAGGED = 2  # state bit: the tile is flagged
+
+# translation tables from bytes to binary digits, to pack bytes into masks
+MINE_DIGITS = bytes(b'01'[i != 0] for i in range(256))
+SAFE_DIGITS = bytes(b'10'[i != 0] for i in range(256))
+OPENED_DIGITS = bytes(b'01'[i & OPENED] for i in range(256))
+
+
+class HugeBoard(object):
+    """HugeBoard: A board stored in lazily materialized chunks instead of tiles."""
+
+    def __init__(self, settings: any):
+        """Initialize a huge board."""
+        self.opts: any = settings
+        self.height: int = self.opts.height  # height
+        self.width: int = self.opts.width  # width
+        self.tile_count: int = self.width * self.height  # tile count
+        self.mines: int = self.opts.mines  # mines
+        self.full: int = (1 << self.height) - 1  # mask of a whole column
+        self.columns: list[int] = [0] * self.width  # mine bitmap by column
+        self.init()
+
+    def xy_index(self, x: int, y: int) -> int:
+        """Convert a 2-D x-y coordinate to an 1-D index."""
+        return x * self.height + y
+
+    def index_xy(self, index: int) -> tuple[int, int]:
+        """Convert an 1-D index to a 2-D x-y coordinate."""
+        return divmod(index, self.height)
+
+    def tile_index(self, tile: int) -> int:
+        """Get the index of a tile, which is the index itself here."""
+        return tile
+
+    def in_board(self, x: int, y: int) -> bool:
+        """Check whether a coordinate is in the board."""
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def get_neighbours(self, x: int, y: int, radius: int = 1,
+                       itself: bool = False) -> Iterator[int]: # yapf: disable
+        """Get indices of neighbours of a 2-D coordinate inside the board."""
+        for i, j in itertools.product(
+                range(max(0, x - radius), min(self.width, x + radius + 1)),
+                range(max(0, y - radius), min(self.height, y + radius + 1))):
+            if i == x and j == y:
+                continue
+            yield self.xy_index(i, j)
+
+        if itself and self.in_board(x, y):
+            yield self.xy_index(x, y)
+
+    def get_area(self, x0: int, y0: int, x1: int, y1: int) -> Iterator[int]:
+        """Get indices inside a rectangle area [x0, x1) x [y0, y1) of the board."""
+        for x in range(max(0, x0), min(self.width, x1)):
+            yield from range(self.xy_index(x, max(0, y0)),
+                             self.xy_index(x, min(self.height, y1)))
+
+    def init(self):
+        """Initialize the board."""
+        self.finish: bool = False
+        self.blast: bool = False
+        self.stats = [0 for _ in range(stats_count)]
+        self.chunks: dict[tuple[int, int], bytearray] = {}  # materialized chunks
+        self.held: set[int] = set()  # indices of pressed tiles
+        self.opened_safe: int = 0  # number of opened tiles without a mine
+
+    def set_mines(self, x, y):
+        """Set mines for the board, sampled outside the area of the first click."""
+        area = sorted(
+            first_click_area(self.width, self.height, self.mines,
+                             self.xy_index(x, y), self.opts.first_click,
+                             self.opts.opening_size))
+        allowed = self.tile_count - len(area)  # tiles outside of the area
+        dense = self.mines * 2 > allowed  # pick safe tiles instead
+        # ranks among the allowed tiles, sampled directly without rejection
+        ranks = random.sample(range(allowed),
+                              allowed - self.mines if dense else self.mines)
+        ranks.sort()
+        picked = bytearray(self.tile_count)  # one byte per tile, temporarily
+        skipped = 0  # tiles of the area before the tile of a rank
+        for rank in ranks:
+            while skipped < len(area) and area[skipped] <= rank + skipped:
+                skipped += 1
+            picked[rank + skipped] = 1
+        if dense:
+            for i in area:
+                picked[i] = 1  # the area is safe as the tiles picked
+        digits = bytes(picked).translate(SAFE_DIGITS if dense else MINE_DIGITS)
+        del picked
+        h = self.height
+        self.columns = [
+            int(digits[x * h:(x + 1) * h][::-1], 2) for x in range(self.width)
+        ]
+
+    def get_mines(self) -> list[int]:
+        """Get indices of the mines of the board."""
+        return [
+            x * self.height + first + k for x, column in enumerate(self.columns)
+            for first, last in runs(column) for k in range(last - first + 1)
+        ]
+
+    def load_mines(self, mines: Iterator[int]):
+        """Load mines from their indices."""
+        for i in mines:
+            self.columns[i // self.height] |= 1 << (i % self.height)
+
+    def get_layout(self) -> tuple[int]:
+        """Get the mine layout of the board to be saved, by column."""
+        return tuple(self.columns)
+
+    def load_layout(self, layout: tuple[int]):
+        """Load a saved mine layout."""
+        self.columns = list(layout)
+
+    def get_states(self) -> dict[tuple[int, int], bytes]:
+        """Get a copy of the state bits of the materialized chunks."""
+        return {key: bytes(chunk) for key, chunk in self.chunks.items()}
+
+    def load_states(self, states: dict[tuple[int, int], bytes]):
+        """Load the state bits of the materialized chunks."""
+        self.chunks = {key: bytearray(chunk) for key, chunk in states.items()}
+        self.stats[STATS.flags] = sum(
+            chunk.count(FLAGGED) for chunk in self.chunks.values())
+        self.stats[STATS.mines_left] = self.mines - self.stats[STATS.flags]
+        opened = self.opened_columns()
+        self.opened_safe = sum((o & ~c).bit_count()
+                               for o, c in zip(opened, self.columns))
+        self.blast = any(o & c for o, c in zip(opened, self.columns))
+        self.finish = self.opened_safe == self.tile_count - self.mines
+
+    def recover_tiles(self):
+        """Recover all of the tiles to COVERED in a board."""
+        self.init()
+
+    def is_mine(self, x: int, y: int) -> bool:
+        """Check whether a tile is a mine."""
+        return self.columns[x] >> y & 1 == 1
+
+    def value(self, x: int, y: int) -> int:
+        """Get the value of a tile: -1 for mines, 0-8 for numbers."""
+        if self.is_mine(x, y):
+            return Tile.MINE
+        near = span(max(0, y - 1), min(self.height - 1, y + 1))
+        return sum((self.columns[i] & near).bit_count()
+                   for i in range(max(0, x - 1), min(self.width, x + 2)))
+
+    def state(self, x: int, y: int) -> int:
+        """Get the state bits of a tile."""
+        chunk = self.chunks.get((x // CHUNK, y // CHUNK))
+        return chunk[x % CHUNK * CHUNK + y % CHUNK] if chunk else 0
+
+    def set_state(self, x: int, y: int, state: int):
+        """Set the state bits of a tile, materializing its chunk."""
+        key = (x // CHUNK, y // CHUNK)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.chunks[key] = bytearray(CHUNK * CHUNK)
+        chunk[x % CHUNK * CHUNK + y % CHUNK] = state
+
+    def neighbour_flags(self, x: int, y: int) -> int:
+        """Count the flags around a tile."""
+        return sum(self.state(*self.index_xy(i)) & FLAGGED != 0
+                   for i in self.get_neighbours(x, y))
+
+    def release(self):
+        """Handle release event from upper layer."""
+        self.held = set()
+
+    def is_finished(self) -> bool:
+        """Check whether the board is finished."""
+        return self.finish
+
+    def is_blasted(self) -> bool:
+        """Check whether the board is blasted."""
+        return self.blast
+
+    def is_ended(self) -> bool:
+        """Check whether the game is ended."""
+        return self.is_finished() or self.is_blasted()
+
+    def board_operate(func):
+        """Decorate board operations."""
+
+        def inner(self, x: int, y: int, *args, replay: bool = False):
+            """Wrap board_operate method."""
+            self.release()
+            changed_tiles = set()
+            if self.in_board(x, y):
+                changed_tiles = func(self, x, y, *args)
+
+            if changed_tiles:
+                self.calc_in_game_stats(changed_tiles, replay)
+                self.finish = self.opened_safe == self.tile_count - self.mines
+
+                # solved statistics are not tracked tile by tile here
+                if self.is_ended():
+                    self.calc_finish_stats()
+            return changed_tiles
+
+        return inner
+
+    def open(self, x: int, y: int, BFS: bool = False) -> set[int]:
+        """Open a tile and flood its opening."""
+        search = deque(((x, y), ))
+        changed = set()
+        while search:
+            x, y = search.popleft()
+            state = self.state(x, y)
+            if state:
+                continue  # flagged or opened already
+            self.set_state(x, y, OPENED)
+            changed.add(self.xy_index(x, y))
+            value = self.value(x, y)
+            if value == Tile.MINE:
+                self.blast = True
+                continue
+            self.opened_safe += 1
+            if value == 0 or (BFS and value == self.neighbour_flags(x, y)):
+                for i in self.get_neighbours(x, y):
+                    search.append(self.index_xy(i))
+        return changed
+
+    def toggle_flag(self, x: int, y: int, flagged: bool):
+        """Put or remove a flag on a covered tile."""
+        self.set_state(x, y, FLAGGED if flagged else 0)
+        self.stats[STATS.flags] += 1 if flagged else -1
+
+    @board_operate
+    def left(self, x: int, y: int, BFS: bool) -> set():
+        """Handle left click event from upper layer."""
+        return self.open(x, y, BFS)
+
+    @board_operate
+    def right(self, x: int, y: int, easy_flag: bool) -> set():
+        """Handle right click event from upper layer."""
+        state = self.state(x, y)
+        if not state & OPENED:
+            self.toggle_flag(x, y, not state & FLAGGED)
+            return set((self.xy_index(x, y), ))
+        elif easy_flag:
+            covered = [
+                i for i in self.get_neighbours(x, y)
+                if not self.state(*self.index_xy(i)) & OPENED
+            ]
+            if self.value(x, y) == len(covered):
+                unflagged = set(i for i in covered
+                                if not self.state(*self.index_xy(i)))
+                for i in unflagged:
+                    self.toggle_flag(*self.index_xy(i), True)
+                return unflagged
+        return set()
+
+    @board_operate
+    def double(self, x: int, y: int, BFS: bool) -> set():
+        """Handle double click event from upper layer."""
+        if self.state(x, y) & OPENED and self.value(
+                x, y) == self.neighbour_flags(x, y):
+            changed = set()
+            for i in self.get_neighbours(x, y):
+                changed |= self.open(*self.index_xy(i), BFS)
+            return changed
+        return set()
+
+    @board_operate
+    def left_hold(self, x: int, y: int) -> set():
+        """Handle left hold event from upper layer."""
+        if not self.state(x, y):
+            self.held.add(self.xy_index(x, y))
+        return set()
+
+    @board_operate
+    def double_hold(self, x: int, y: int) -> set():
+        """Handle double hold event from upper layer."""
+        for i in self.get_neighbours(x, y, itself=True):
+            if not self.state(*self.index_xy(i)):
+                self.held.add(i)
+        return set()
+
+    def status(self, index: int) -> int:
+        """Get the status of a tile for upper layer."""
+        x, y = self.index_xy(index)
+        state = self.state(x, y)
+        if self.blast or self.finish:
+            mine = self.is_mine(x, y)
+            if state & FLAGGED:
+                return Tile.WRONGFLAG if self.blast and not mine else Tile.FLAGGED
+            elif state & OPENED:
+                return Tile.BLAST if mine else self.value(x, y)
+            elif mine:
+                return Tile.MINE if self.blast else Tile.UNFLAGGED
+        if state & FLAGGED:
+            return Tile.FLAGGED
+        elif state & OPENED:
+            return self.value(x, y)
+        elif index in self.held:
+            return Tile.DOWN
+        return Tile.COVERED
+
+    def update_tiles(self, tiles: Iterator[int]):
+        """Update status of tiles: nothing to do, as status() derives it from the chunks on demand."""
+
+    def update_finish(self):
+        """Update status of tiles after finishing a game: nothing to do, as status() shows the flags once finished."""
+
+    def update_blast(self):
+        """Update status of tiles after failing a game: nothing to do, as status() shows the mines once blasted."""
+
+    def output(self, tiles: Iterator[int] = None):
+        """Output coordinate and status of tiles (all tiles by default)."""
+        if tiles is None:
+            tiles = range(self.tile_count)
+        return [(*self.index_xy(i), self.status(i)) for i in tiles]
+
+    def zero_columns(self) -> list[int]:
+        """Get the masks of the tiles without any mine around, by column."""
+        return [~around & self.full for around in dilate(self.columns)]
+
+    def opened_columns(self) -> list[int]:
+        """Get the masks of the opened tiles by column, chunk by chunk."""
+        opened = [0] * self.width
+        for (cx, cy), chunk in self.chunks.items():
+            for x in range(cx * CHUNK, min(self.width, (cx + 1) * CHUNK)):
+                start = (x - cx * CHUNK) * CHUNK
+                digits = bytes(chunk[start:start + CHUNK])
+                digits = digits.translate(OPENED_DIGITS)[::-1]
+                opened[x] |= int(digits, 2) << (cy * CHUNK)
+        return [mask & self.full for mask in opened]
+
+    def island_columns(self, zeros: list[int]) -> list[int]:
+        """Get the masks of the numbers away from any opening, by column."""
+        return [
+            ~near & ~mines & self.full
+            for near, mines in zip(dilate(zeros), self.columns)
+        ]
+
+    def calc_basic_stats(self):
+        """Calculate basic statistics."""
+        zeros = self.zero_columns()
+        islands = self.island_columns(zeros)
+        self.stats[STATS.OP] = len(components(zeros))
+        self.stats[STATS.IS] = len(components(islands))
+        self.stats[STATS.BBBV] = self.stats[STATS.OP] + sum(
+            mask.bit_count() for mask in islands)
+
+    def calc_in_game_stats(self, changed_tiles: set[int], replay: bool):
+        """Calculate statistics during a game."""
+        self.stats[STATS.mines_left] = self.mines - self.stats[STATS.flags]
+
+    def calc_finish_stats(self):
+        """Calculate statistics after the game is ended."""
+        zeros = self.zero_columns()
+        islands = self.island_columns(zeros)
+        opened = self.opened_columns()
+
+        def solved(group) -> bool:
+            """Check whether every tile of a component is opened."""
+            return all(not span(f, l) & ~opened[x] for x, f, l in group)
+
+        self.stats[STATS.solved_OP] = sum(
+            solved(group) for group in components(zeros))
+        self.stats[STATS.solved_IS] = sum(
+            solved(group) for group in components(islands))
+        self.stats[STATS.solved_BBBV] = self.stats[STATS.solved_OP] + sum(
+            (islands[x] & opened[x]).bit_count() for x in range(self.width))
+
@@ -0,0 +1,223 @@
+"""Layout: a compact bit-packed encoding of boards and corpora of boards.
+
+A board is encoded as a header and a bitmap of its mines, with bit i of the
+bitmap for the tile of index i (x * height + y). The covered and flagged
+planes of a game in progress may follow, compressed together. A corpus of
+boards of the same size is a header and the bitmaps packed back to back, e.g.
+60 bytes for each expert board.
+
+Bits are packed and unpacked through big integers and translation tables, so
+a whole board is handled by a few calls instead of a loop over its tiles.
+"""
+
+from functools import lru_cache
+from typing import Iterator
+
+import zlib
+import struct
+
+MAGIC = b'MSLY'  # the header of an encoded board
+CORPUS_MAGIC = b'MSLC'  # the header of an encoded corpus
+VERSION = 1  # version of the encoding
+HEADER = struct.Struct('<4sBHHIB')  # magic, version, width, height, mines, planes
+PLANES = 1  # flag of the header: the covered and flagged planes follow
+OPENED = 1  # state bit: the tile is opened
+FLAGGED = 2  # state bit: the tile is flagged
+
+# translation tables between bytes of tiles, binary digits and board digits
+_BINARY = bytes(b'01'[i != 0] for i in range(256))
+_FROM_BINARY = bytes(i == 49 for i in range(256))
+_OPENED_BITS = bytes(b'01'[i & OPENED != 0] for i in range(256))
+_FLAGGED_BITS = bytes(b'01'[i & FLAGGED != 0] for i in range(256))
+_TO_DIGITS = bytes((48 + i) & 255 for i in range(256))
+_MINE_DIGITS = bytes(i == 57 for i in range(256))
+
+
+def bitmap_size(width: int, height: int) -> int:
+    """Get the bytes of a bitmap of a board size."""
+    return (width * height + 7) // 8
+
+
+def pack_bits(flags: bytes, table: bytes = _BINARY) -> bytes:
+    """Pack a byte of each tile into a bitmap, set where the table gives '1'."""
+    size = (len(flags) + 7) // 8
+    return int(flags.translate(table)[::-1], 2).to_bytes(size, 'little')
+
+
+def unpack_bits(bitmap: bytes, count: int) -> bytes:
+    """Unpack a bitmap into a byte of each tile, 1 where the bit is set."""
+    bits = int.from_bytes(bitmap, 'little')
+    return format(bits, f'0{count}b')[::-1].encode().translate(_FROM_BINARY)
+
+
+def indices(flags: bytes) -> list[int]:
+    """Get the indices of the tiles with a byte set."""
+    found, index = [], flags.find(1)
+    while index >= 0:
+        found.append(index)
+        index = flags.find(1, index + 1)
+    return found
+
+
+def flags_of(count: int, mines: Iterator[int]) -> bytes:
+    """Get a byte of each tile, 1 for the mines at some indices."""
+    flags = bytearray(count)
+    for i in mines:
+        flags[i] = 1
+    return bytes(flags)
+
+
+def encode(width: int, height: int, mines: bytes, states: bytes = None) -> bytes:
+    """Encode the mine flags of a board, and the states of its tiles if any."""
+    bitmap = pack_bits(mines)
+    data = HEADER.pack(MAGIC, VERSION, width, height, mines.count(1),
+                       PLANES if states is not None else 0) + bitmap
+    if states is not None:
+        opened = pack_bits(states, _OPENED_BITS)
+        flagged = pack_bits(states, _FLAGGED_BITS)
+        data += zlib.compress(opened + flagged)
+    return data
+
+
+def decode(data: bytes) -> tuple[int, int, bytes, bytes]:
+    """Decode a board into its size, mine flags and states (None if absent)."""
+    magic, version, width, height, mines, planes = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('invalid layout')
+    count, size = width * height, bitmap_size(width, height)
+    start = HEADER.size
+    flags = unpack_bits(data[start:start + size], count)
+    if flags.count(1) != mines:
+        raise ValueError('invalid layout')
+    states = None
+    if planes & PLANES:
+        planes = zlib.decompress(data[start + size:])
+        opened = int.from_bytes(unpack_bits(planes[:size], count), 'little')
+        flagged = int.from_bytes(unpack_bits(planes[size:], count), 'little')
+        states = (opened | flagged << 1).to_bytes(count, 'little')
+    return width, height, flags, states
+
+
+def encode_board(board: any, states: bool = False) -> bytes:
+    """Encode a board, with the states of its tiles if asked."""
+    states = board.get_states() if states else None
+    if isinstance(states, dict):
+        raise ValueError('the states of a huge board are kept by chunks')
+    mines = flags_of(board.tile_count, board.get_mines())
+    return encode(board.width, board.height, mines, states)
+
+
+def load_board(board: any, data: bytes):
+    """Load an encoded board into a new board of the same size."""
+    width, height, flags, states = decode(data)
+    if (width, height) != (board.width, board.height):
+        raise ValueError('the size of the layout does not match the board')
+    if states is not None and not any(states):
+        states = None  # all covered, as a new board is
+    if states is not None and isinstance(board.get_states(), dict):
+        raise ValueError('the states of a huge board are kept by chunks')
+    board.load_mines(indices(flags))
+    if states is not None:
+        board.calc_basic_stats()
+        board.load_states(states)
+
+
+@lru_cache(maxsize=32)
+def shifts(width: int, height: int) -> tuple[tuple[int, int]]:
+    """Get the shifts and masks moving mines onto their neighbours."""
+    count = width * height
+    full = (1 << count) - 1
+    column = (1 << height) - 1
+    not_top = column ^ 1  # tiles with a neighbour above in a column
+    not_bottom = column >> 1  # tiles with a neighbour below in a column
+    repeat = sum(1 << (x * height) for x in range(width))
+    masks = {-1: not_top * repeat, 1: not_bottom * repeat}
+    # a mine at i is moved onto i + dx * height + dy when the tile exists
+    return tuple(
+        (dx * height + dy, masks[dy] if dy else full)
+        for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy)
+
+
+def counts(width: int, height: int, mines: int) -> list[int]:
+    """Count the mines around each tile into 4 bit planes of big integers."""
+    full = (1 << width * height) - 1
+    planes = [0, 0, 0, 0]
+    for shift, mask in shifts(width, height):
+        carry = mines & mask
+        carry = (carry << shift if shift > 0 else carry >> -shift) & full
+        for k in range(4):
+            planes[k], carry = planes[k] ^ carry, planes[k] & carry
+    return planes
+
+
+def to_rows(width: int, height: int, mines: bytes) -> list[str]:
+    """Get the board rows of the analyzer from the mine flags of a board."""
+    count = width * height
+    bits = int.from_bytes(pack_bits(mines), 'little')
+    values = 9 * int.from_bytes(mines, 'little')
+    for k, plane in enumerate(counts(width, height, bits)):
+        plane &= ~bits  # mines are 9 whatever their neighbours are
+        values += int.from_bytes(unpack_bits(
+            plane.to_bytes(bitmap_size(width, height), 'little'), count),
+                                 'little') << k # yapf: disable
+    text = values.to_bytes(count, 'little').translate(_TO_DIGITS).decode()
+    return [text[row::height] for row in range(height)]
+
+
+def from_rows(rows: list) -> tuple[int, int, bytes]:
+    """Get the size and mine flags of a board from the board rows of the analyzer."""
+    height, width = len(rows), len(rows[0])
+    text = ''.join(''.join(each_row) for each_row in rows).encode()
+    return width, height, b''.join(
+        text[col::width] for col in range(width)).translate(_MINE_DIGITS)
+
+
+def initial_rows(width: int, height: int, states: bytes) -> list[str]:
+    """Get the initial board rows of the analyzer, '1' for the opened tiles."""
+    text = states.translate(_OPENED_BITS).decode()
+    return [text[row::height] for row in range(height)]
+
+
+def pack_corpus(width: int, height: int, layouts: Iterator[bytes]) -> bytes:
+    """Pack the mine flags of boards of the same size into a corpus."""
+    return HEADER.pack(CORPUS_MAGIC, VERSION, width, height, 0, 0) + b''.join(
+        pack_bits(mines) for mines in layouts)
+
+
+class Corpus(object):
+    """Corpus: bit-packed boards of the same size, read without copying."""
+
+    def __init__(self, data: bytes):
+        """Open a packed corpus."""
+        magic, version, self.width, self.height, _, _ = HEADER.unpack_from(data)
+        if magic != CORPUS_MAGIC or version != VERSION:
+            raise ValueError('invalid corpus')
+        self.count: int = self.width * self.height
+        self.size: int = bitmap_size(self.width, self.height)
+        self.view: memoryview = memoryview(data)[HEADER.size:]
+        if len(self.view) % self.size:
+            raise ValueError('truncated corpus')
+
+    def __len__(self) -> int:
+        """Get the number of boards."""
+        return len(self.view) // self.size
+
+    def __getitem__(self, index: int) -> memoryview:
+        """Get the bitmap of a board."""
+        if not 0 <= index < len(self):
+            raise IndexError('board index out of range')
+        return self.view[index * self.size:(index + 1) * self.size]
+
+    def mines(self, index: int) -> bytes:
+        """Get the mine flags of a board."""
+        return unpack_bits(self[index], self.count)
+
+    def rows(self, index: int) -> list[str]:
+        """Get the board rows of the analyzer of a board."""
+        return to_rows(self.width, self.height, self.mines(index))
+
+
+def read_corpus(path: str) -> Corpus:
+    """Read a corpus from a file."""
+    with open(path, 'rb') as f:
+        return Corpus(f.read())
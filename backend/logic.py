@@ -0,0 +1,142 @@
+"""Logic: safe tiles and mines deduced from the visible numbers alone.
+
+Two kinds of deductions are applied to the constraints of the frontier, both
+reduced by the tiles deduced before:
+* a single constraint whose value is 0 (all safe) or its tile count (all mines)
+* a pair of overlapping constraints A and B, where B has as many more mines
+  than A as tiles outside of A: these are mines and the tiles of A outside of
+  B are safe, which covers the subset and the 1-2 patterns
+
+Only the constraints changed by the frontier, and the constraints around the
+tiles deduced meanwhile, are rechecked, so keeping up with an operation costs
+about the tiles it changes, and a hint is a lookup.
+"""
+
+from .frontier import Frontier
+from .zini import neighbour_table
+
+
+class Logic(object):
+    """Logic: safe tiles and mines deduced from the visible numbers alone."""
+
+    def __init__(self, frontier: Frontier):
+        """Initialize the deductions of the board of a frontier."""
+        self.frontier: Frontier = frontier
+        board = frontier.board
+        # shared by the boards of a size, the x columns being the rows
+        self.neighbours: tuple[tuple[int]] = neighbour_table(
+            board.width, board.height)
+        self.init()
+
+    def init(self):
+        """Forget the deductions, rechecking every constraint of the frontier."""
+        self.known: dict[int, int] = {}  # deduced tiles: 1 for mines, 0 for safe
+        self.safe: dict[int, None] = {}  # tiles deduced safe, in deduced order
+        self.mines: dict[int, None] = {}  # tiles deduced as mines, in deduced order
+        self.pending: set[int] = set(self.frontier.constraints)
+        self.frontier.changed.clear()
+
+    def reduced(self, index: int) -> tuple[frozenset[int], int]:
+        """Get the constraint of a tile without the deduced tiles, or None."""
+        constraint = self.frontier.constraints.get(index)
+        if constraint is None:
+            return None
+        cells, value = constraint
+        known = self.known
+        if known.keys().isdisjoint(cells):
+            return constraint
+        unknown = frozenset(c for c in cells if c not in known)
+        if not unknown:
+            return None
+        return unknown, value - sum(known.get(c, 0) for c in cells)
+
+    def deduce(self, cells, mine: int):
+        """Record tiles as deduced, rechecking the constraints around them."""
+        known, pending = self.known, self.pending
+        constraints = self.frontier.constraints
+        found = self.mines if mine else self.safe
+        for c in cells:
+            if c not in known:
+                known[c] = mine
+                found[c] = None
+                pending.update(i for i in self.neighbours[c]
+                               if i in constraints)
+
+    def forget(self, cells):
+        """Forget the deductions of tiles, rechecking the constraints around them."""
+        known, pending = self.known, self.pending
+        constraints = self.frontier.constraints
+        for c in cells:
+            if known.pop(c, None) is not None:
+                self.safe.pop(c, None)
+                self.mines.pop(c, None)
+                pending.update(i for i in self.neighbours[c]
+                               if i in constraints)
+
+    def check(self, index: int):
+        """Check a constraint alone and paired with the constraints overlapping it."""
+        constraint = self.reduced(index)
+        if constraint is None:
+            return
+        cells, value = constraint
+        if value == 0 or value == len(cells):
+            self.deduce(cells, int(value != 0))
+            return
+        constraints, seen = self.frontier.constraints, {index}
+        for c in cells:
+            for other in self.neighbours[c]:
+                if other in seen or other not in constraints:
+                    continue
+                seen.add(other)
+                paired = self.reduced(other)
+                if paired is None:
+                    continue
+                others, other_value = paired
+                for a, va, b, vb in ((cells, value, others, other_value),
+                                     (others, other_value, cells, value)):
+                    outside = b - a
+                    if vb - va == len(outside) and (outside or a - b):
+                        self.deduce(outside, 1)
+                        self.deduce(a - b, 0)
+                        if index in self.pending:
+                            return  # rechecked with the deductions anyway
+
+    def refresh(self):
+        """Recheck the constraints changed since the last refresh."""
+        changed, pending = self.frontier.changed, self.pending
+        if changed:
+            pending |= changed
+            changed.clear()
+        while pending:
+            self.check(pending.pop())
+
+    def safe_tiles(self) -> list[int]:
+        """Get the covered tiles deduced safe, which are not flagged."""
+        self.refresh()
+        opened, tiles = self.frontier.opened, self.frontier.board.tiles
+        for c in [c for c in self.safe if c in opened]:
+            del self.safe[c]  # opened since deduced
+        return [c for c in self.safe if not tiles[c].flagged]
+
+    def mine_tiles(self) -> list[int]:
+        """Get the covered tiles deduced as mines, which are not flagged yet."""
+        self.refresh()
+        tiles = self.frontier.board.tiles
+        return [
+            c for c in self.mines if tiles[c].covered and not tiles[c].flagged
+        ]
+
+    def hint(self) -> int:
+        """Get a covered tile deduced safe, or None if the logic finds none."""
+        self.refresh()
+        opened, tiles = self.frontier.opened, self.frontier.board.tiles
+        stale, found = [], None
+        for c in self.safe:
+            if c in opened:
+                stale.append(c)
+            elif not tiles[c].flagged:
+                found = c
+                break
+        for c in stale:
+            del self.safe[c]  # opened since deduced
+        return found
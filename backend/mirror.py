@@ -0,0 +1,132 @@
+"""Mirror: live statistics of a game in shared memory, for external readers.
+
+The block has a fixed little-endian layout, so overlays in any language can
+map it by its name and read it at any rate:
+- 0: magic b'MSSM', u16 version of the layout, u16 count of statistics
+- 8: u64 sequence, odd while the statistics are being written
+- 16: f64 wall time (time.time()) of the last write
+- 24: f64 seconds of the game at the last write, running on if playing
+- 32: u32 state (0 not started, 1 playing, 2 won, 3 lost)
+- 36: u16 width, u16 height, u32 mines
+- 44: i32 statistics in the order of STATS
+
+A writer bumps the sequence before and after each write, like a seqlock. A
+reader copies the statistics between two reads of the same even sequence,
+retrying otherwise, so the game never waits for its readers.
+"""
+
+from .stats import STATS, stats_count
+from multiprocessing import shared_memory, resource_tracker
+
+import sys
+import time
+import struct
+
+MAGIC = b'MSSM'  # the header of the block
+VERSION = 1  # version of the layout
+NAME = 'minesweeper-stats'  # default name of the block
+HEADER = struct.Struct('<4sHH')  # magic, version, count of statistics
+SEQUENCE = struct.Struct('<Q')  # sequence of writes, at the offset 8
+PAYLOAD = struct.Struct(f'<ddIHHI{stats_count}i')  # at the offset 16
+SEQUENCE_OFFSET = HEADER.size
+PAYLOAD_OFFSET = SEQUENCE_OFFSET + SEQUENCE.size
+SIZE = PAYLOAD_OFFSET + PAYLOAD.size  # bytes of the block
+READY, PLAYING, WON, LOST = range(4)  # states of the game
+RETRIES = 1000  # reads of a block until a consistent snapshot
+BACKOFF = 1e-5  # seconds slept by a reader between two reads of a block
+
+
+def game_state(game: any) -> int:
+    """Get the state of a game as written into the block."""
+    if game.win:
+        return WON
+    if game.lose:
+        return LOST
+    return READY if game.first else PLAYING
+
+
+class Mirror(object):
+    """Mirror: live statistics of a game in shared memory, for external readers."""
+
+    def __init__(self, name: str = NAME):
+        """Create the block, or take it over if left by a previous run."""
+        try:
+            self.memory = shared_memory.SharedMemory(name, create=True,
+                                                     size=SIZE)
+        except FileExistsError:
+            self.memory = shared_memory.SharedMemory(name)
+            if self.memory.size < SIZE:
+                self.memory.close()
+                raise ValueError(f'The shared memory {name} is too small!')
+        self.buffer: memoryview = self.memory.buf
+        self.sequence: int = 0
+        SEQUENCE.pack_into(self.buffer, SEQUENCE_OFFSET, 0)
+        HEADER.pack_into(self.buffer, 0, MAGIC, VERSION, stats_count)
+
+    def write(self, game: any):
+        """Write the statistics of a game, bumping the sequence around them."""
+        counter, opts = game.counter, game.opts
+        buffer, sequence = self.buffer, self.sequence
+        SEQUENCE.pack_into(buffer, SEQUENCE_OFFSET, sequence + 1)
+        PAYLOAD.pack_into(buffer, PAYLOAD_OFFSET, time.time(),
+                          counter.get_time(), game_state(game), opts.width,
+                          opts.height, opts.mines, *game.stats) # yapf: disable
+        SEQUENCE.pack_into(buffer, SEQUENCE_OFFSET, sequence + 2)
+        self.sequence = sequence + 2
+
+    def close(self):
+        """Remove the block."""
+        self.buffer.release()
+        self.memory.close()
+        self.memory.unlink()
+
+
+class Reader(object):
+    """Reader: consistent snapshots of the statistics written by a mirror."""
+
+    def __init__(self, name: str = NAME):
+        """Map the block of a mirror without owning it."""
+        self.memory = shared_memory.SharedMemory(name)
+        if sys.version_info < (3, 13) and sys.platform != 'win32':
+            # the block is removed by the mirror, not at the exit of a reader
+            resource_tracker.unregister(self.memory._name, 'shared_memory')
+        magic, version, count = HEADER.unpack_from(self.memory.buf)
+        if magic != MAGIC or version != VERSION or count != stats_count:
+            self.memory.close()
+            raise ValueError(f'The shared memory {name} is not a mirror!')
+
+    def read(self) -> dict:
+        """Read a consistent snapshot, with the seconds of the game by now."""
+        buffer = self.memory.buf
+        for _ in range(RETRIES):
+            before, = SEQUENCE.unpack_from(buffer, SEQUENCE_OFFSET)
+            payload = PAYLOAD.unpack_from(buffer, PAYLOAD_OFFSET)
+            after, = SEQUENCE.unpack_from(buffer, SEQUENCE_OFFSET)
+            if before == after and not before & 1:
+                break
+            time.sleep(BACKOFF)  # let the writer finish, even on a single core
+        else:
+            raise TimeoutError('The mirror is written too often!')
+        written, seconds, state, width, height, mines = payload[:6]
+        stats = payload[6:]
+        if state == PLAYING:
+            seconds += time.time() - written
+        bbbv, solved = stats[STATS.BBBV], stats[STATS.solved_BBBV]
+        return {
+            'sequence': before,
+            'state': state,
+            'time': seconds,
+            'width': width,
+            'height': height,
+            'mines': mines,
+            'stats': stats,
+            'bbbv': bbbv,
+            'solved_bbbv': solved,
+            'bbbv_s': solved / seconds if seconds > 0 else 0.0,
+            'clicks': stats[STATS.total_cl],
+            'effective_clicks': stats[STATS.total_ce],
+        }
+
+    def close(self):
+        """Unmap the block."""
+        self.memory.close()
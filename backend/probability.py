@@ -0,0 +1,239 @@
+"""Probability: exact mine probabilities of the covered tiles."""
+
+from .frontier import Frontier
+from functools import lru_cache
+from collections import deque
+
+import math
+
+
+@lru_cache(maxsize=4096)
+def comb(n: int, k: int) -> int:
+    """Get the binomial coefficient, memoized for the unconstrained interior."""
+    return math.comb(n, k) if 0 <= k <= n else 0
+
+
+def convolve(a: dict[int, int], b: dict[int, int]) -> dict[int, int]:
+    """Convolve two distributions of mine counts."""
+    result = {}
+    for i, wi in a.items():
+        for j, wj in b.items():
+            result[i + j] = result.get(i + j, 0) + wi * wj
+    return result
+
+
+def propagate(constraints: list[tuple[frozenset[int], int]]):
+    """Fix the tiles that are trivially safe or mines, and reduce the constraints."""
+    fixed: dict[int, int] = {}
+    changed = True
+    while changed:
+        changed = False
+        reduced = []
+        for cells, value in constraints:
+            unknown = [c for c in cells if c not in fixed]
+            value -= sum(fixed[c] for c in cells if c in fixed)
+            if not unknown:
+                continue
+            if value == 0 or value == len(unknown):
+                for c in unknown:
+                    fixed[c] = int(value != 0)  # 1 for mines, 0 for safe tiles
+                changed = True
+                continue
+            reduced.append((frozenset(unknown), value))
+        constraints = reduced
+    return fixed, constraints
+
+
+def components(constraints: list[tuple[frozenset[int], int]]):
+    """Split the constraints into independent components."""
+    cell_constraints: dict[int, list[int]] = {}
+    for i, (cells, _) in enumerate(constraints):
+        for c in cells:
+            cell_constraints.setdefault(c, []).append(i)
+
+    visited = [False] * len(constraints)
+    for start in range(len(constraints)):
+        if visited[start]:
+            continue
+        visited[start] = True
+        stack, component = [start], []
+        while stack:
+            i = stack.pop()
+            component.append(constraints[i])
+            for c in constraints[i][0]:
+                for j in cell_constraints[c]:
+                    if not visited[j]:
+                        visited[j] = True
+                        stack.append(j)
+        yield frozenset(component)
+
+
+def shift(a: dict[int, int], k: int) -> dict[int, int]:
+    """Shift a distribution of mine counts by k mines."""
+    return {i + k: w for i, w in a.items()} if k else a
+
+
+def order_cells(component: list[tuple[frozenset[int], int]]) -> list[int]:
+    """Order the tiles of a component by a breadth-first sweep, keeping few constraints open."""
+    cell_constraints: dict[int, list[int]] = {}
+    for i, (cells, _) in enumerate(component):
+        for c in cells:
+            cell_constraints.setdefault(c, []).append(i)
+
+    def sweep(start: int) -> list[int]:
+        """Sweep the tiles breadth-first from a tile."""
+        order, seen, queue = [], {start}, deque((start, ))
+        while queue:
+            c = queue.popleft()
+            order.append(c)
+            for i in cell_constraints[c]:
+                for cc in sorted(component[i][0]):
+                    if cc not in seen:
+                        seen.add(cc)
+                        queue.append(cc)
+        return order
+
+    # start again from the farthest tile, which is close to an end of the frontier
+    order = sweep(sweep(min(cell_constraints))[-1])
+    return order
+
+
+def enumerate_component(component: frozenset):
+    """Count the solutions and the mines of each tile of a component by mine count."""
+    component = sorted(component, key=lambda c: min(c[0]))
+    cells = order_cells(component)
+    n = len(cells)
+    position = {c: k for k, c in enumerate(cells)}
+    first = [min(position[c] for c in members) for members, _ in component]
+    last = [max(position[c] for c in members) for members, _ in component]
+    cell_constraints = [[] for _ in cells]
+    remaining = [{} for _ in cells]  # unassigned tiles of a constraint after a tile
+    for i, (members, _) in enumerate(component):
+        positions = sorted(position[c] for c in members)
+        for j, k in enumerate(positions):
+            cell_constraints[k].append(i)
+            remaining[k][i] = len(positions) - j - 1
+    active = [[i for i in range(len(component)) if first[i] < k <= last[i]]
+              for k in range(n + 1)]  # constraints left open before a tile
+
+    def step(k: int, state: tuple, v: int):
+        """Assign v mines to the k-th tile, returning the next state if valid."""
+        needs = dict(zip(active[k], state))
+        for i in cell_constraints[k]:
+            need = needs.get(i, component[i][1]) - v
+            if need < 0 or need > remaining[k][i]:
+                return None
+            needs[i] = need
+        return tuple(needs[i] for i in active[k + 1])
+
+    # sweep forwards over the tiles, merging equal states of open constraints
+    forward = [{(): {0: 1}}]
+    for k in range(n):
+        layer = {}
+        for state, dist in forward[k].items():
+            for v in (0, 1):
+                following = step(k, state, v)
+                if following is not None:
+                    merged = layer.setdefault(following, {})
+                    for m, w in shift(dist, v).items():
+                        merged[m] = merged.get(m, 0) + w
+        forward.append(layer)
+
+    # sweep backwards, then combine both sides for the mines of each tile
+    backward = {(): {0: 1}}
+    counts: dict[int, list] = {
+        m: [w, [0] * n]
+        for m, w in forward[n].get((), {}).items()
+    }  # mines: [solutions, mines of each tile]
+    for k in range(n - 1, -1, -1):
+        layer = {}
+        for state, dist in forward[k].items():
+            for v in (0, 1):
+                following = step(k, state, v)
+                if following not in backward:
+                    continue
+                rest = shift(backward[following], v)
+                merged = layer.setdefault(state, {})
+                for m, w in rest.items():
+                    merged[m] = merged.get(m, 0) + w
+                if v:
+                    for m, w in convolve(dist, rest).items():
+                        counts[m][1][k] += w
+        backward = layer
+    return cells, counts
+
+
+class Probability(object):
+    """Probability: exact mine probabilities of the covered tiles."""
+
+    def __init__(self, frontier: Frontier):
+        """Initialize the probability engine."""
+        self.frontier: Frontier = frontier
+        self.cache: dict[frozenset, tuple] = {}  # solved components
+
+    def solve(self, component: frozenset):
+        """Solve a component, reusing the result of an unchanged one."""
+        result = self.cache.get(component)
+        if result is None:
+            result = enumerate_component(component)
+        return result
+
+    def compute(self) -> list[float]:
+        """Compute the mine probability of each tile (1-D index) on the board."""
+        board = self.frontier.board
+        probabilities = [0.0] * board.tile_count
+        for index in self.frontier.known_mines:
+            probabilities[index] = 1.0
+
+        fixed, constraints = propagate(self.frontier.constraints.values())
+        frontier = set(fixed)
+        for cells, _ in constraints:
+            frontier.update(cells)
+        interior = self.frontier.covered_count() - len(frontier)
+        mines = self.frontier.mines_left() - sum(fixed.values())
+
+        # solve every component, keeping only the ones in use in the cache
+        cache, solved = {}, []
+        for component in components(constraints):
+            cache[component] = self.solve(component)
+            solved.append(cache[component])
+        self.cache = cache
+
+        # distributions of the mine count, prefixed and suffixed by component
+        weights = [{k: v[0]
+                    for k, v in counts.items()} for _, counts in solved]
+        prefix = [{0: 1}]
+        for w in weights:
+            prefix.append(convolve(prefix[-1], w))
+        suffix = [{0: 1}]
+        for w in reversed(weights):
+            suffix.append(convolve(suffix[-1], w))
+        suffix.reverse()
+
+        total = sum(w * comb(interior, mines - m)
+                    for m, w in prefix[-1].items())
+        if total == 0:
+            return probabilities  # the visible state is inconsistent
+
+        for i, (cells, counts) in enumerate(solved):
+            others = convolve(prefix[i], suffix[i + 1])
+            per_tile = [0] * len(cells)
+            for k, (_, mines_of_tiles) in counts.items():
+                factor = sum(w * comb(interior, mines - k - m)
+                             for m, w in others.items())
+                if factor:
+                    for j, v in enumerate(mines_of_tiles):
+                        per_tile[j] += v * factor
+            for c, v in zip(cells, per_tile):
+                probabilities[c] = v / total
+
+        for c, v in fixed.items():
+            probabilities[c] = float(v)
+
+        if interior:
+            p = sum(w * comb(interior - 1, mines - m - 1)
+                    for m, w in prefix[-1].items()) / total
+            for index in range(board.tile_count):
+                if index not in frontier and index not in self.frontier.opened:
+                    probabilities[index] = p
+        return probabilities
@@ -0,0 +1,103 @@
+"""Replay: play back a recorded game with keyframe seeking."""
+
+from .game import Game
+from .feed import Feed, STATUS_OFFSET
+from array import array
+from bisect import bisect_right
+
+KEYFRAME_INTERVAL = 64  # actions between two keyframes
+
+
+class Replay(object):
+    """Replay: play back a recorded game with keyframe seeking."""
+
+    def __init__(self, settings: any, mines: list[int],
+                 actions: list[tuple[float, str, int, int]],
+                 interval: int = KEYFRAME_INTERVAL): # yapf: disable
+        """Prepare the keyframes and deltas of a recorded game."""
+        self.interval: int = interval
+        self.times: list[float] = [t for t, *_ in actions]
+        game = Game(settings)
+        game.load_mines(mines)
+        self.height: int = game.board.height
+        self.width: int = game.board.width
+        self.tile_count: int = game.board.tile_count
+
+        status = bytearray(game.feed.statuses)
+        self.keyframes: list[bytes] = [bytes(status)]  # statuses every interval
+        self.deltas: list[array] = []  # (index << 4 | status) of each action
+        self.stats: list[tuple[int]] = [tuple(game.stats)]  # stats of each step
+        for step, (_, op, x, y) in enumerate(actions, 1):
+            version = game.feed.version
+            getattr(game, op)(x, y)
+            self.deltas.append(self.record(status, game.feed, version))
+            self.stats.append(tuple(game.stats))
+            if step % interval == 0:
+                self.keyframes.append(bytes(status))
+
+        self.status: bytearray = bytearray(self.keyframes[0])
+        self.step: int = 0  # number of actions played
+        self.dirty: set[int] = set()  # indices changed since the last output
+        self.stable: bool = False  # whether only the dirty tiles need output
+
+    def record(self, status: bytearray, feed: Feed, version: int) -> array:
+        """Record the changes of a step from the feed into statuses, returning them."""
+        delta = array('i')
+        changes = feed.since(version)
+        if changes is None:
+            # more changes than the feed keeps, compare all of the statuses
+            delta.extend(i << 4 | s for i, (s, old) in enumerate(
+                zip(feed.statuses, status)) if s != old)
+        else:
+            for view in changes:
+                delta.extend(view)
+        for entry in delta:
+            status[entry >> 4] = entry & 15
+        return delta
+
+    def steps(self) -> int:
+        """Get the number of actions of the replay."""
+        return len(self.deltas)
+
+    def duration(self) -> float:
+        """Get the total time of the replay."""
+        return self.times[-1] if self.times else 0.0
+
+    def seek(self, step: int):
+        """Seek to the state after a number of actions."""
+        step = max(0, min(step, self.steps()))
+        if step < self.step or step - self.step > self.interval:
+            keyframe = step // self.interval
+            self.status[:] = self.keyframes[keyframe]
+            self.step = keyframe * self.interval
+            self.stable = False
+        while self.step < step:
+            for entry in self.deltas[self.step]:
+                self.status[entry >> 4] = entry & 15
+                self.dirty.add(entry >> 4)
+            self.step += 1
+
+    def seek_time(self, time: float):
+        """Seek to the state at a time of the replay."""
+        self.seek(bisect_right(self.times, time))
+
+    def get_stats(self) -> tuple[int]:
+        """Get the statistics at the current step."""
+        return self.stats[self.step]
+
+    def board_output(self, forced_whole_board=False, area=None):
+        """Output the tiles changed since the last output, like Game does."""
+        if self.stable and not forced_whole_board:
+            indices = self.dirty
+        elif area is not None:
+            x0, y0, x1, y1 = area
+            indices = (x * self.height + y
+                       for x in range(max(0, x0), min(self.width, x1))
+                       for y in range(max(0, y0), min(self.height, y1)))
+        else:
+            indices = range(self.tile_count)
+        output = [(*divmod(i, self.height), self.status[i] - STATUS_OFFSET)
+                  for i in indices]
+        self.dirty = set()
+        self.stable = True
+        return output
@@ -0,0 +1,121 @@
+"""Runner: replay recorded actions straight on a board without any UI."""
+
+from .board import Board
+from .counter import Counter
+from .stats import STATS
+from multiprocessing import Pool
+from types import SimpleNamespace
+
+BUTTONS = {
+    'left': Counter.LEFT,
+    'right': Counter.RIGHT,
+    'double': Counter.DOUBLE,
+    'left_hold': Counter.OTHERS,
+    'double_hold': Counter.OTHERS,
+}  # operations of a board and the clicks they count
+OPCODES = {0: 'left', 1: 'right', 4: 'double'}  # opcodes of analyzer actions
+CHECKED = {
+    'bv': STATS.BBBV,
+    'op': STATS.OP,
+    'is': STATS.IS,
+    'solved_bv': STATS.solved_BBBV,
+    'solved_op': STATS.solved_OP,
+    'left': STATS.left_cl,
+    'right': STATS.right_cl,
+    'double': STATS.double_cl,
+    'cl': STATS.total_cl,
+    'ce': STATS.total_ce,
+}  # results of the analyzer and the statistics of the game they match
+
+
+def record_settings(rows: int, columns: int, mines: int) -> any:
+    """Get the settings of a board as played in a record of the analyzer."""
+    return SimpleNamespace(mode=0, huge=False, height=rows, width=columns,
+                           mines=mines, bfs=False, easy_flag=False, nf=False,
+                           first_click='safe', opening_size=1) # yapf: disable
+
+
+class Runner(object):
+    """Runner: replay recorded actions straight on a board without any UI."""
+
+    def __init__(self, settings: any):
+        """Build a board to be reused by the replays of its size."""
+        self.opts: any = settings
+        self.board: Board = Board(settings)
+
+    def run(self, mines: list[int], actions) -> list[int]:
+        """Replay the (time, op, x, y) actions of a game, getting its statistics."""
+        board, opts = self.board, self.opts
+        board.clear_tiles()
+        board.load_mines(mines)
+        stats = board.stats
+        started = False  # clicks are counted from the first left click
+        for _, op, x, y in actions:
+            button = BUTTONS.get(op)
+            if button is None or opts.nf and op in ('right', 'double',
+                                                    'double_hold'):
+                continue
+            x, y = int(x), int(y)
+            if op == 'left':
+                if not started:
+                    board.calc_basic_stats()
+                    started = True
+                changed_tiles = board.left(x, y, opts.bfs, replay=True)
+            elif op == 'right':
+                changed_tiles = board.right(x, y, opts.easy_flag, replay=True)
+            elif op == 'double':
+                changed_tiles = board.double(x, y, opts.bfs, replay=True)
+            else:
+                changed_tiles = getattr(board, op)(x, y, replay=True)
+            # count the clicks as Counter.refresh does during a game
+            if started and button != Counter.OTHERS:
+                stats[STATS.total_cl] += 1
+                stats[STATS.total_cl + button] += 1
+                if changed_tiles:
+                    stats[STATS.total_ce] += 1
+                    stats[STATS.total_ce + button] += 1
+            if board.is_ended():
+                break
+        return list(stats)
+
+
+_runners: dict[tuple, Runner] = {}  # runners of a worker by their settings
+
+
+def run(job: tuple) -> list[int]:
+    """Run a job of (settings, mines, actions) on a runner of its board size."""
+    settings, mines, actions = job
+    kind = (settings.width, settings.height, settings.mines, settings.bfs,
+            settings.easy_flag, settings.nf)
+    if kind not in _runners:
+        _runners[kind] = Runner(settings)
+    return _runners[kind].run(mines, actions)
+
+
+def run_all(jobs, processes: int = None, chunksize: int = 16):
+    """Run jobs of (settings, mines, actions) in parallel, yielding in order."""
+    with Pool(processes) as pool:
+        yield from pool.imap(run, jobs, chunksize)
+
+
+def from_record(record: any) -> tuple:
+    """Convert a record of the analyzer into a job of the runner."""
+    rows, columns = record.result['row'], record.result['column']
+    mines = [
+        i % columns * rows + i // columns
+        for i, v in enumerate(record.grid) if v == 9
+    ]
+    actions = [(time / 1000, OPCODES[opcode], col, row)
+               for opcode, row, col, time in record.action
+               if opcode in OPCODES]
+    return record_settings(rows, columns, len(mines)), mines, actions
+
+
+def cross_check(record: any) -> dict[str, tuple]:
+    """Replay a record of the analyzer, getting the results which differ."""
+    stats = run(from_record(record))
+    result = record.get_result()
+    return {
+        key: (result[key], stats[index])
+        for key, index in CHECKED.items() if result[key] != stats[index]
+    }
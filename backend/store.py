@@ -0,0 +1,184 @@
+"""Store: a local history of finished games in SQLite."""
+
+from .stats import STATS
+from .layout import pack_bits, flags_of
+from queue import Queue, Empty
+from threading import Thread
+
+import sqlite3
+import time
+
+BATCH_SIZE = 256  # games written in a transaction at most
+ROLLING_GAMES = 100  # wins in the rolling 3BV/s
+KIND = ('mode', 'width', 'height', 'mines')  # columns of a kind of board
+COLUMNS = ('BBBV', 'OP', 'IS', 'solved_BBBV', 'solved_OP', 'solved_IS',
+           'flags', 'total_ce', 'left_ce', 'right_ce', 'double_ce',
+           'total_cl', 'left_cl', 'right_cl', 'double_cl')  # from STATS
+QUOTED = ', '.join(f'"{c}"' for c in COLUMNS)  # IS is a keyword of SQL
+
+SCHEMA = f'''
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    ended REAL NOT NULL,
+    mode INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    mines INTEGER NOT NULL,
+    win INTEGER NOT NULL,
+    upk INTEGER NOT NULL,
+    time REAL NOT NULL,
+    {', '.join(f'"{c}" INTEGER NOT NULL' for c in COLUMNS)},
+    layout BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_mode ON games (mode, width, height, mines, win);
+CREATE INDEX IF NOT EXISTS games_bbbv ON games ("BBBV");
+CREATE INDEX IF NOT EXISTS games_time ON games (time);
+CREATE TABLE IF NOT EXISTS bests (
+    mode INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    mines INTEGER NOT NULL,
+    games INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    best_time REAL,
+    best_bbbvs REAL,
+    rolling_sum REAL NOT NULL DEFAULT 0,
+    rolling_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (mode, width, height, mines)
+);
+'''
+INSERT = (f'INSERT INTO games (ended, {", ".join(KIND)}, win, upk, time, '
+          f'{QUOTED}, layout) '
+          f'VALUES ({", ".join("?" * (len(KIND) + len(COLUMNS) + 5))})')
+WHERE_KIND = ' AND '.join(f'{c} = ?' for c in KIND)
+
+
+def pack_layout(board) -> bytes:
+    """Pack the mines of a board into a bitmap of its indices."""
+    return pack_bits(flags_of(board.tile_count, board.get_mines()))
+
+
+def bbbvs(bbbv: int, time: float) -> float:
+    """Get the 3BV per second of a game."""
+    return bbbv / time if time > 0 else 0.0
+
+
+class Store(object):
+    """Store: a local history of finished games in SQLite."""
+
+    def __init__(self, path: str):
+        """Open a store, writing games on a background thread."""
+        self.path: str = path
+        self.queue: Queue = Queue()
+        self.reader: sqlite3.Connection = None  # connection of the caller
+        self.writer: Thread = Thread(target=self.write, daemon=True)
+        self.writer.start()
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a connection to the store."""
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        connection.execute('PRAGMA journal_mode = WAL')
+        connection.executescript(SCHEMA)
+        return connection
+
+    def record(self, game):
+        """Queue a finished game, only copying its statistics."""
+        opts, stats = game.opts, game.stats
+        self.queue.put(
+            (time.time(), opts.mode, opts.width, opts.height, opts.mines,
+             game.win, game.upk, game.counter.get_time(),
+             *(stats[getattr(STATS, c)] for c in COLUMNS),
+             pack_layout(game.board)))
+
+    def write(self):
+        """Write the queued games in batches until the store is closed."""
+        connection = self.connect()
+        closed = False
+        while not closed:
+            batch = [self.queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Empty:
+                    break
+            rows = [row for row in batch if row is not None]
+            closed = len(rows) < len(batch)
+            with connection:
+                for row in rows:
+                    self.insert(connection, row)
+            for _ in batch:
+                self.queue.task_done()
+        connection.close()
+
+    def insert(self, connection: sqlite3.Connection, row: tuple):
+        """Insert a game and update the aggregates of its kind of board."""
+        connection.execute(INSERT, row)
+        kind, win, upk, game_time = row[1:5], row[5], row[6], row[7]
+        bbbv = row[8]
+        connection.execute(
+            f'INSERT OR IGNORE INTO bests ({", ".join(KIND)}) '
+            'VALUES (?, ?, ?, ?)', kind)
+        best = connection.execute(f'SELECT * FROM bests WHERE {WHERE_KIND}',
+                                  kind).fetchone()
+        games, wins = best['games'] + 1, best['wins']
+        best_time, best_bbbvs = best['best_time'], best['best_bbbvs']
+        rolling_sum, rolling_count = best['rolling_sum'], best['rolling_count']
+        if win and not upk:
+            speed = bbbvs(bbbv, game_time)
+            wins += 1
+            if best_time is None or game_time < best_time:
+                best_time = game_time
+            if best_bbbvs is None or speed > best_bbbvs:
+                best_bbbvs = speed
+            rolling_sum += speed
+            if rolling_count < ROLLING_GAMES:
+                rolling_count += 1
+            else:
+                # drop the win falling out of the rolling window
+                dropped = connection.execute(
+                    f'SELECT "BBBV", time FROM games WHERE {WHERE_KIND} '
+                    'AND win AND NOT upk ORDER BY id DESC LIMIT 1 OFFSET ?',
+                    (*kind, ROLLING_GAMES)).fetchone()
+                rolling_sum -= bbbvs(*dropped)
+        connection.execute(
+            'UPDATE bests SET games = ?, wins = ?, best_time = ?, '
+            'best_bbbvs = ?, rolling_sum = ?, rolling_count = ? '
+            f'WHERE {WHERE_KIND}', (games, wins, best_time, best_bbbvs,
+                                    rolling_sum, rolling_count, *kind))
+
+    def query(self, sql: str, parameters: tuple = ()) -> list[dict]:
+        """Query the store from the calling thread."""
+        if self.reader is None:
+            self.reader = self.connect()
+        return [dict(row) for row in self.reader.execute(sql, parameters)]
+
+    def bests(self) -> list[dict]:
+        """Get the aggregates of every kind of board, with the rolling 3BV/s."""
+        return [
+            dict(row, rolling_bbbvs=row['rolling_sum'] /
+                 max(1, row['rolling_count'])) for row in self.query(
+                     f'SELECT * FROM bests ORDER BY {", ".join(KIND)}')
+        ]
+
+    def games(self, mode: int, width: int, height: int, mines: int,
+              order: str = 'time', limit: int = 100) -> list[dict]: # yapf: disable
+        """Get the won games of a kind of board, by time, 3BV or latest."""
+        orders = {'time': 'time', 'BBBV': '"BBBV" DESC', 'latest': 'id DESC'}
+        return self.query(
+            f'SELECT * FROM games WHERE {WHERE_KIND} AND win '
+            f'ORDER BY {orders[order]} LIMIT ?',
+            (mode, width, height, mines, limit))
+
+    def flush(self):
+        """Wait for the queued games to be written."""
+        self.queue.join()
+
+    def close(self):
+        """Write the queued games and close the store."""
+        if self.writer.is_alive():
+            self.queue.put(None)
+            self.writer.join()
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
@@ -1,7 +1,7 @@
 """The tile class."""
 
 from typing import Iterable
-from queue import Queue
+from collections import deque
 from time import monotonic_ns, perf_counter_ns
 
 timer = perf_counter_ns
@@ -17,6 +17,9 @@ class Tile(object):
     DOWN = 10  # opcode: DOWN, 10
     FLAGGED = 11  # opcode: FLAGGED, 11
 
+    __slots__ = ('x', 'y', 'value', 'flagged', 'covered', 'down', 'status',
+                 'neighbours', 'neighbour_flags')  # many tiles live at once
+
     def __init__(self, x: int, y: int):
         """Initialize a tile."""
         self.x: int = x  # coordinate X
@@ -26,7 +29,7 @@ class Tile(object):
         self.covered: bool = True  # cover indicator
         self.down: bool = False  # pressed indicator
         self.status: int = Tile.COVERED  # status for upper layer
-        self.neighbours: set[Tile] = set()  # neighbours
+        self.neighbours: tuple[Tile] = ()  # neighbours
         self.neighbour_flags: int = 0  # number of neighbour flags
 
     def __repr__(self) -> str:
@@ -41,6 +44,20 @@ class Tile(object):
         """Get the status of the tile."""
         return self.status
 
+    def get_state(self) -> int:
+        """Get the state of the tile: bit 0 for opened, bit 1 for flagged."""
+        return (not self.covered) | self.flagged << 1
+
+    def set_state(self, state: int):
+        """Set the state of the tile, keeping neighbour flags up to date."""
+        flagged = state >> 1 == 1
+        if flagged != self.flagged:
+            for t in self.get_neighbours():
+                t.neighbour_flags += 1 if flagged else -1
+        self.flagged = flagged
+        self.covered = not state & 1
+        self.down = False
+
     def set_mine(self):
         """Set a tile with a mine."""
         self.value = Tile.MINE
@@ -55,13 +72,13 @@ class Tile(object):
         """Judge whether the tile is a mine by its value."""
         return self.value == Tile.MINE
 
-    def get_neighbours(self) -> set:
+    def get_neighbours(self) -> tuple:
         """Get the neighbours of a tile."""
         return self.neighbours
 
     def set_neighbours(self, neighbours: Iterable):
         """Set the neighbours of a tile."""
-        self.neighbours = set(neighbours)
+        self.neighbours = tuple(neighbours)
 
     def recover(self):
         """Recover the status of the tile."""
@@ -125,26 +142,24 @@ class Tile(object):
 
     def open(self, BFS: bool = False, test_op: bool = False):
         """Handle normal opening."""
-        search = Queue()
-        search.put(self)
+        search = deque((self, ))
         searched = set()
         changed = set()
         # sa = sb = sc = sd = 0
         # p = 0
-        while not search.empty():
+        while search:
             # a = timer()
-            t = search.get()
+            t = search.popleft()
             # p += 1
             # sa += timer() - a
             # b = timer()
             eff, to_search = t.basic_open(BFS)
             # sb += timer() - b
             # c = timer()
-            for tt in to_search:
-                search.put(tt)
+            search.extend(to_search)
             # sc += timer() - c
-            # if test_op:
-            #     searched.add(t)
+            if test_op:
+                searched.add(t)
             # d = timer()
             if eff:
                 changed.add(t)
@@ -0,0 +1,238 @@
+"""ZiNi: estimates of the fewest clicks solving a board with flags and chords.
+
+Boards are grids of values (9 for mines) in reading order, with a table of
+the neighbours of each block. Every number has a premium: the 3BV solved by
+chording it, less the clicks it takes (a click opening it if covered, a
+click flagging each unflagged mine around and the chord itself).
+* ZiNi repeatedly chords the number of the highest non-negative premium, or
+  clicks the first unsolved 3BV in reading order if there is none.
+* HZiNi scans the board in reading order as a human does, chording the
+  first number of a non-negative premium, or clicking the first unsolved
+  3BV if it comes before.
+
+Premiums are tabulated once for the covered board, then shifted by each
+block opened or flagged on the numbers around it, and the candidates are kept
+in heaps whose outdated entries are skipped, so a board costs about its blocks.
+"""
+
+from .layout import to_rows, unpack_bits
+from .generation import neighbours
+from functools import lru_cache
+from multiprocessing import Pool
+
+import heapq
+
+MINE = 9  # value of a mine
+NONE = -1  # unit of a number next to an opening, which solves no 3BV
+LOW = -1 << 20  # premium of the blocks which are not numbers, never chorded
+CHUNK = 4096  # boards of a corpus scored by a process at a time
+_VALUES = bytes(i - 48 if 48 <= i <= 57 else 0 for i in range(256))  # from digits
+
+
+@lru_cache(maxsize=32)
+def neighbour_table(rows: int, columns: int) -> tuple[tuple[int]]:
+    """Get the indices of the neighbours of each block, in reading order."""
+    return tuple(
+        tuple(neighbours(rows, columns, i)) for i in range(rows * columns))
+
+
+class Solver(object):
+    """Solver: a simulated game of flags and chords on a grid."""
+
+    def __init__(self, grid: bytes, table: tuple[tuple[int]]):
+        """Label the 3BV of each block and tabulate the premiums of a covered board."""
+        self.grid: bytes = grid
+        self.table: tuple[tuple[int]] = table
+        count = len(grid)
+        # units of 3BV: the openings first, then the numbers away from them
+        self.unit: list[int] = [NONE] * count
+        self.openings: list[list[int]] = []  # blocks opened by each opening
+        self.edges: list[list[int]] = []  # numbers around each opening
+        for start in range(count):
+            if grid[start] or self.unit[start] != NONE:
+                continue
+            unit, stack, blocks = len(self.openings), [start], {start}
+            self.unit[start] = unit
+            while stack:
+                i = stack.pop()
+                for j in table[i]:
+                    if j not in blocks:
+                        blocks.add(j)  # a zero, or the edge of the opening
+                        if grid[j] == 0:
+                            self.unit[j] = unit
+                            stack.append(j)
+            self.openings.append(sorted(blocks))
+            self.edges.append([i for i in self.openings[-1] if grid[i]])
+        edges = {i for blocks in self.edges for i in blocks}
+        units = len(self.openings)
+        for i in range(count):
+            if 0 < grid[i] < MINE and i not in edges:
+                self.unit[i] = units
+                units += 1
+        self.bbbv: int = units
+        self.initial: list[int] = [
+            self.compute(i) if 0 < grid[i] < MINE else LOW
+            for i in range(count)
+        ]  # premiums of the covered board
+
+    def compute(self, index: int) -> int:
+        """Compute the premium of chording a number of the covered board."""
+        grid, unit = self.grid, self.unit
+        cost = 2  # the click opening it and the chord
+        gain = unit[index] != NONE
+        openings = set()
+        for j in self.table[index]:
+            value = grid[j]
+            if value == MINE:
+                cost += 1  # the click flagging it
+            elif value == 0:
+                openings.add(unit[j])
+            elif unit[j] != NONE:
+                gain += 1
+        return gain + len(openings) - cost
+
+    def reset(self):
+        """Cover every block, starting from the tabulated premiums."""
+        count = len(self.grid)
+        self.opened: bytearray = bytearray(count)
+        self.flagged: bytearray = bytearray(count)
+        self.solved: int = 0  # 3BV solved so far
+        self.clicks: int = 0
+        self.next: int = 0  # no unsolved 3BV before this block
+        self.premium: list[int] = self.initial[:]
+
+    def open(self, index: int, changed: list[int]):
+        """Open a block, or its whole opening if it is a zero, updating the premiums."""
+        opened, premium = self.opened, self.premium
+        if opened[index]:
+            return
+        unit = self.unit[index]
+        if self.grid[index] == 0:
+            self.solved += 1
+            for i in self.edges[unit]:
+                # the opening is no gain any more, and an opened edge needs no click
+                premium[i] -= opened[i]
+            for i in self.openings[unit]:
+                opened[i] = 1
+            changed.extend(self.edges[unit])
+        else:
+            opened[index] = 1
+            premium[index] += 1  # no click opening it any more
+            changed.append(index)
+            if unit != NONE:
+                self.solved += 1
+                premium[index] -= 1
+                for i in self.table[index]:
+                    premium[i] -= 1
+                changed.extend(self.table[index])
+
+    def flag(self, index: int, changed: list[int]):
+        """Flag a mine, saving a click of the numbers around."""
+        self.flagged[index] = 1
+        self.clicks += 1
+        premium = self.premium
+        for i in self.table[index]:
+            premium[i] += 1
+        changed.extend(self.table[index])
+
+    def chord(self, index: int) -> list[int]:
+        """Open a number if covered, flag the mines around and chord it."""
+        self.clicks += 1 if self.opened[index] else 2
+        changed = []
+        self.open(index, changed)
+        grid, flagged = self.grid, self.flagged
+        for j in self.table[index]:
+            if grid[j] == MINE:
+                if not flagged[j]:
+                    self.flag(j, changed)
+            else:
+                self.open(j, changed)
+        return changed
+
+    def click(self) -> list[int]:
+        """Click the first unsolved 3BV in reading order."""
+        self.clicks += 1
+        changed = []
+        self.open(self.first_unsolved(), changed)
+        return changed
+
+    def first_unsolved(self) -> int:
+        """Get the first block of an unsolved 3BV in reading order."""
+        grid, opened, unit = self.grid, self.opened, self.unit
+        i = self.next
+        while opened[i] or grid[i] == MINE or unit[i] == NONE:
+            i += 1
+        self.next = i
+        return i
+
+    def zini(self) -> int:
+        """Count the clicks, chording the number of the highest premium first."""
+        self.reset()
+        premium = self.premium
+        heap = [(-p, i) for i, p in enumerate(premium) if p >= 0]
+        heapq.heapify(heap)
+        while self.solved < self.bbbv:
+            while heap and premium[heap[0][1]] != -heap[0][0]:
+                heapq.heappop(heap)  # outdated
+            if heap:
+                changed = self.chord(heapq.heappop(heap)[1])
+            else:
+                changed = self.click()
+            for i in set(changed):
+                if premium[i] >= 0:
+                    heapq.heappush(heap, (-premium[i], i))
+        return self.clicks
+
+    def hzini(self) -> int:
+        """Count the clicks, chording or clicking the first candidate in reading order."""
+        self.reset()
+        premium = self.premium
+        heap = [i for i, p in enumerate(premium) if p >= 0]
+        heapq.heapify(heap)
+        while self.solved < self.bbbv:
+            while heap and premium[heap[0]] < 0:
+                heapq.heappop(heap)  # outdated
+            if heap and heap[0] <= self.first_unsolved():
+                changed = self.chord(heapq.heappop(heap))
+            else:
+                changed = self.click()
+            for i in set(changed):
+                if premium[i] >= 0:
+                    heapq.heappush(heap, i)
+        return self.clicks
+
+
+def zini(grid: bytes, table: tuple[tuple[int]]) -> int:
+    """Get the ZiNi of a grid of values in reading order."""
+    return Solver(grid, table).zini()
+
+
+def hzini(grid: bytes, table: tuple[tuple[int]]) -> int:
+    """Get the HZiNi of a grid of values in reading order."""
+    return Solver(grid, table).hzini()
+
+
+def score(job: tuple) -> list[tuple[int, int, int]]:
+    """Score the bitmaps of a corpus chunk as (3BV, ZiNi, HZiNi) of each board."""
+    width, height, size, bitmaps = job
+    table = neighbour_table(height, width)
+    scores = []
+    for start in range(0, len(bitmaps), size):
+        mines = unpack_bits(bitmaps[start:start + size], width * height)
+        grid = ''.join(to_rows(width, height, mines)).encode().translate(
+            _VALUES)
+        solver = Solver(grid, table)
+        scores.append((solver.bbbv, solver.zini(), solver.hzini()))
+    return scores
+
+
+def score_corpus(corpus: any, processes: int = None):
+    """Score the boards of a corpus in parallel, yielding in order."""
+    step = CHUNK * corpus.size
+    view = corpus.view
+    jobs = ((corpus.width, corpus.height, corpus.size,
+             bytes(view[start:start + step]))
+            for start in range(0, len(view), step))
+    with Pool(processes) as pool:
+        for scores in pool.imap(score, jobs):
+            yield from scores
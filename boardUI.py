@@ -2,15 +2,32 @@
 
 from settings import load_settings
 from backend.game import Game
+from backend.replay import Replay
+from backend.feed import STATUS_OFFSET
+from backend.store import Store
+from backend.autosave import Autosave
+from backend.mirror import Mirror
+from backend.background import Background
 from resources import get_skin
+from replayUI import replayBar
+from latency import Latency
 from PyQt5 import QtWidgets
-from PyQt5.QtCore import pyqtSignal, Qt
-from PyQt5.QtGui import QPainter, QMouseEvent
+from PyQt5.QtCore import pyqtSignal, Qt, QTimer, QRect
+from PyQt5.QtGui import QPainter, QColor, QKeySequence, QFont
 
 from time import monotonic_ns, perf_counter_ns
+from multiprocessing import get_context
+
+import os
+import math
 
 timer = perf_counter_ns
 NS2MS = 1e-6
+NS2S = 1e-9
+ZOOM_FACTORS = (0.25, 0.375, 0.5, 0.75, 1, 1.5, 2, 3)  # zoom levels
+SCROLL_STEP = 3  # tiles scrolled by a wheel step
+FRAME_INTERVAL = 16  # milliseconds of a frame, over which moves are coalesced
+AUTOSAVE_INTERVAL = 5000  # milliseconds between two snapshots of the game
 
 
 class boardUI(QtWidgets.QWidget):
@@ -21,9 +38,10 @@ class boardUI(QtWidgets.QWidget):
     left = pyqtSignal(int, int)
     right = pyqtSignal(int, int)
     double = pyqtSignal(int, int)
+    mouse_move = pyqtSignal(int, int)  # only the path of the mouse
+    computed = pyqtSignal(int, str, object)  # results of background jobs
     # left_move = pyqtSignal(int, int)
     # double_move = pyqtSignal(int, int)
-    drag = pyqtSignal(QMouseEvent)
 
     def __init__(self, parent=None):
         """Init the board UI."""
@@ -31,24 +49,72 @@ class boardUI(QtWidgets.QWidget):
         self.setAttribute(Qt.WA_OpaquePaintEvent, True)
         self.signals = [
             self.left_hold, self.double_hold, self.left, self.right,
-            self.double, self.drag
+            self.double, self.mouse_move
         ]
         self.setMouseTracking(True)
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.replay = None  # the replay being played, or None in live play
+        self.replay_bar = None
+        self.replay_timer = QTimer(self)
+        self.replay_timer.setInterval(16)
+        self.replay_timer.timeout.connect(self.replay_tick)
+        self.store = Store(os.path.join(os.getcwd(), 'history.db'))
+        self.autosave = Autosave(os.path.join(os.getcwd(), 'autosave.bin'))
+        # results are emitted by a thread of the pool, and queued to the UI;
+        # workers are spawned, not forked with the state of Qt
+        self.background = Background(self.computed.emit,
+                                     context=get_context('spawn'))
+        self.computed.connect(self.receive)
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.setInterval(AUTOSAVE_INTERVAL)
+        self.autosave_timer.timeout.connect(
+            lambda: self.autosave.save(self.game))
+        self.move_timer = QTimer(self)  # coalesces the moves of a frame
+        self.move_timer.setSingleShot(True)
+        self.move_timer.setInterval(FRAME_INTERVAL)
+        self.move_timer.timeout.connect(self.apply_move)
+        self.moved = None  # the latest move waiting for the next frame
+        self.pressed = None  # the tile and buttons of the last press
+        self.latency = Latency()
+        self.show_latency = False  # whether the latency overlay is shown
         self.init_board()
+        self.autosave_timer.start()
 
     def init_board(self):
         """Init the board."""
         self.settings = load_settings()
+        self.mirror = None  # live statistics shared with overlays
+        if self.settings.ui.overlay:
+            try:
+                self.mirror = Mirror(self.settings.ui.overlay)
+            except (OSError, ValueError):
+                pass
 
-        self.game = Game(self.settings.game)
+        self.game = Game(self.settings.game, self.store, self.mirror,
+                         self.background)
+        snapshot = self.autosave.load()
+        if snapshot is not None:
+            self.game.restore(snapshot)  # recover the game after a crash
         self.height, self.width = self.game.board.height, self.game.board.width
         self.slots = [
             self.game.left_hold, self.game.double_hold, self.game.left,
-            self.game.right, self.game.double, self.mousePressEvent
+            self.game.right, self.game.double, self.game.move
         ]
 
-        self.tile_size = self.settings.ui.size
-        self.tile_maps = get_skin(self.settings.ui.skin, self.settings.ui.size)
+        # pre-scale the skin for every zoom level
+        size = self.settings.ui.size
+        self.zoom_sizes = sorted(
+            set(max(4, round(size * f)) for f in ZOOM_FACTORS))
+        self.skins = {
+            s: get_skin(self.settings.ui.skin, s)
+            for s in self.zoom_sizes
+        }
+        self.zoom = self.zoom_sizes.index(size)
+        self.tile_size = size
+        self.tile_maps = self.skins[size]
+        self.offset_x, self.offset_y = 0, 0  # top left of the viewport
+        self.forced = True  # whether the whole viewport should be redrawn
+        self.version = 0  # version of the changes of the game painted
 
         self.doubled = False  # hold L, click R, then the release of L should be ignored
 
@@ -59,27 +125,214 @@ class boardUI(QtWidgets.QWidget):
                 pass
             signal.connect(slot)
 
+    def receive(self, generation, name, result):
+        """Hand the result of a background job over to the game."""
+        self.game.receive(generation, name, result)
+
+    def visible_area(self):
+        """Get the tiles intersecting the viewport as (x0, y0, x1, y1)."""
+        size, view = self.tile_size, self.rect()
+        return (self.offset_x // size, self.offset_y // size,
+                (self.offset_x + view.width() - 1) // size + 1,
+                (self.offset_y + view.height() - 1) // size + 1)
+
     def paintEvent(self, event):
-        """Paint the board."""
+        """Paint the tiles inside the viewport."""
+        self.latency.paint_started()
         super().paintEvent(event)
         painter = QPainter()
         painter.begin(self)
         # painter.setCompositionMode(QPainter.CompositionMode_ColorBurn)
         size = self.tile_size
-        temp = self.game.board_output()
-        for x, y, status in temp:
-            painter.drawPixmap(x * size, y * size, self.tile_maps[status])
+        x0, y0, x1, y1 = area = self.visible_area()
+        if self.forced:
+            painter.fillRect(self.rect(), QColor(Qt.darkGray))
+        drawn = 0
+        changes = None
+        if not (self.replay or self.forced):
+            changes = self.game.changes(self.version)
+        if changes is not None:
+            # only the tiles changed since the last paint of the game
+            for view in changes:
+                for entry in view:
+                    x, y = divmod(entry >> 4, self.height)
+                    if x0 <= x < x1 and y0 <= y < y1:
+                        painter.drawPixmap(
+                            x * size - self.offset_x, y * size - self.offset_y,
+                            self.tile_maps[(entry & 15) - STATUS_OFFSET])
+                        drawn += 1
+        else:
+            source = self.replay if self.replay else self.game
+            temp = source.board_output(self.forced or not self.replay, area)
+            for x, y, status in temp:
+                if x0 <= x < x1 and y0 <= y < y1:
+                    painter.drawPixmap(x * size - self.offset_x,
+                                       y * size - self.offset_y,
+                                       self.tile_maps[status])
+                    drawn += 1
+        self.forced = False
+        self.version = self.game.feed.version
+        if self.show_latency:
+            self.paint_latency(painter)
         painter.end()
+        self.latency.painted(drawn)
+
+    def paint_latency(self, painter):
+        """Paint the latency overlay on the top left corner."""
+        lines = self.latency.report()
+        painter.setFont(QFont('monospace', 9))
+        height = painter.fontMetrics().height()
+        width = max(painter.fontMetrics().width(line) for line in lines)
+        painter.fillRect(0, 0, width + 8, height * len(lines) + 8,
+                         QColor(Qt.black))
+        painter.setPen(QColor(Qt.white))
+        for i, line in enumerate(lines):
+            painter.drawText(4, 4 + height * i + painter.fontMetrics().ascent(),
+                             line)
+
+    def toggle_latency(self):
+        """Show or hide the latency overlay."""
+        self.show_latency = not self.show_latency
+        self.forced = True  # wipe the overlay away when hidden
+        self.update()
+
+    def scroll_to(self, offset_x, offset_y):
+        """Scroll the viewport, keeping it inside the board."""
+        view = self.rect()
+        self.offset_x = max(
+            0, min(offset_x, self.width * self.tile_size - view.width()))
+        self.offset_y = max(
+            0, min(offset_y, self.height * self.tile_size - view.height()))
+        self.forced = True
+        self.update()
 
-    def resize(self, new_size):
-        """Resize the board."""
-        self.tile_maps = get_skin(self.opts["skin"], new_size)
+    def set_zoom(self, zoom, anchor_x=0.0, anchor_y=0.0):
+        """Zoom to a level, keeping the board point under the anchor in place."""
+        zoom = max(0, min(zoom, len(self.zoom_sizes) - 1))
+        old_size, size = self.tile_size, self.zoom_sizes[zoom]
+        x_axis, y_axis = self.to_board(anchor_x, anchor_y)
+        self.zoom, self.tile_size, self.tile_maps = zoom, size, self.skins[size]
+        self.scroll_to(round(x_axis * size - anchor_x),
+                       round(y_axis * size - anchor_y))
+
+    def to_board(self, x, y):
+        """Map a position in the widget to a board coordinate."""
+        return ((x + self.offset_x) / self.tile_size,
+                (y + self.offset_y) / self.tile_size)
+
+    def event_to_board(self, event):
+        """Map the position of a mouse event to a tile of the board."""
+        x_axis, y_axis = self.to_board(event.localPos().x(),
+                                       event.localPos().y())
+        return math.floor(x_axis), math.floor(y_axis)
+
+    def wheelEvent(self, event):
+        """Scroll with the wheel, or zoom around the cursor with Ctrl held."""
+        steps = event.angleDelta().y() // 120
+        if not steps:
+            return
+        if event.modifiers() & Qt.ControlModifier:
+            self.set_zoom(self.zoom + steps,
+                          event.pos().x(), event.pos().y())
+        elif event.modifiers() & Qt.ShiftModifier:
+            self.scroll_to(
+                self.offset_x - steps * SCROLL_STEP * self.tile_size,
+                self.offset_y)
+        else:
+            self.scroll_to(
+                self.offset_x,
+                self.offset_y - steps * SCROLL_STEP * self.tile_size)
+
+    def resizeEvent(self, event):
+        """Keep the viewport inside the board after resizing."""
+        self.scroll_to(self.offset_x, self.offset_y)
+
+    def start_replay(self):
+        """Replay the last game."""
+        if not self.game.actions or not self.game.replayable:
+            return
+        self.stop_replay()
+        self.replay = Replay(self.settings.game, self.game.board.get_mines(),
+                             self.game.actions)
+        self.replay_time, self.replay_speed = 0.0, 1.0
+        self.replay_bar = replayBar(self.replay.duration(), self)
+        self.replay_bar.play.connect(self.play_replay)
+        self.replay_bar.speed.connect(self.set_replay_speed)
+        self.replay_bar.seek.connect(self.seek_replay)
+        self.replay_bar.show()
+        self.forced = True
+        self.update()
+
+    def stop_replay(self):
+        """Go back to live play."""
+        if self.replay is None:
+            return
+        self.replay_timer.stop()
+        self.replay_bar.close()
+        self.replay, self.replay_bar = None, None
+        self.forced = True
         self.update()
 
+    def play_replay(self, playing):
+        """Play or pause the replay."""
+        if playing:
+            if self.replay_time >= self.replay.duration():
+                self.replay_time = 0.0  # play again from the beginning
+            self.replay_clock = timer()
+            self.replay_timer.start()
+        else:
+            self.replay_timer.stop()
+
+    def set_replay_speed(self, speed):
+        """Set the speed of the replay."""
+        self.replay_speed = speed
+
+    def seek_replay(self, time):
+        """Seek the replay to a time."""
+        self.replay_time = time
+        self.replay.seek_time(time)
+        self.replay_bar.set_time(time)
+        self.update()
+
+    def replay_tick(self):
+        """Advance the replay by the elapsed time."""
+        now = timer()
+        self.replay_time += (now - self.replay_clock) * NS2S * self.replay_speed
+        self.replay_clock = now
+        if self.replay_time >= self.replay.duration():
+            self.replay_time = self.replay.duration()
+            self.replay_bar.button.setChecked(False)
+        self.seek_replay(self.replay_time)
+
+    def keyPressEvent(self, event):
+        """Handle key press event: R replays, Space plays/pauses, Esc quits, F3/F4 show/log latency."""
+        if event.key() == Qt.Key_R:
+            self.start_replay()
+        elif event.key() == Qt.Key_F3:
+            self.toggle_latency()
+        elif event.key() == Qt.Key_F4:
+            self.latency.toggle_log(os.path.join(os.getcwd(), 'latency.log'))
+        elif self.replay is None:
+            if event.matches(QKeySequence.Undo):
+                self.game.undo()
+                self.update()
+            elif event.matches(QKeySequence.Redo):
+                self.game.redo()
+                self.update()
+            else:
+                super().keyPressEvent(event)
+        elif event.key() == Qt.Key_Space:
+            self.replay_bar.button.toggle()
+        elif event.key() == Qt.Key_Escape:
+            self.stop_replay()
+
     def mousePressEvent(self, event):
         """Handle mouse press event."""
-        x_axis = event.localPos().x() / self.tile_size
-        y_axis = event.localPos().y() / self.tile_size
+        if self.replay:
+            return
+        self.latency.input(event)
+        self.move_timer.stop()  # the press supersedes the pending move
+        x_axis, y_axis = self.event_to_board(event)
         signal = int(event.buttons()) % 4
         if signal == 1 and not self.doubled:
             self.left_hold.emit(x_axis, y_axis)
@@ -87,6 +340,8 @@ class boardUI(QtWidgets.QWidget):
             self.right.emit(x_axis, y_axis)
         elif signal == 3:
             self.double_hold.emit(x_axis, y_axis)
+        self.pressed = (x_axis, y_axis, signal)
+        self.latency.handled()
 
         if int(event.buttons()) == 4:
             self = self.game.init_upk()
@@ -95,9 +350,11 @@ class boardUI(QtWidgets.QWidget):
 
     def mouseReleaseEvent(self, event):
         """Handle mouse release event."""
-        # a = timer()
-        x_axis = event.localPos().x() / self.tile_size
-        y_axis = event.localPos().y() / self.tile_size
+        if self.replay:
+            return
+        self.latency.input(event)
+        self.move_timer.stop()  # the pending move is released as well
+        x_axis, y_axis = self.event_to_board(event)
         signal = int(event.buttons()) % 4
         if (signal == 1 and event.button() == Qt.RightButton) or (
                 signal == 2 and event.button() == Qt.LeftButton):
@@ -107,17 +364,64 @@ class boardUI(QtWidgets.QWidget):
             if event.button() == Qt.LeftButton and not self.doubled:
                 self.left.emit(x_axis, y_axis)
             self.doubled = False
+        self.pressed = None
+        self.latency.handled()
         self.update()
-        # print((timer() - a)*NS2MS)
 
     def mouseMoveEvent(self, event):
-        """Handle mouse move event."""
+        """Handle mouse move event, coalescing the moves until the next frame."""
+        if self.replay:
+            return
         signal = int(event.buttons()) % 4
-        if signal != 2:
-            self.drag.emit(event)
+        if not self.move_timer.isActive():
+            self.latency.input(event)  # the first move of the frame
+            self.move_timer.start()
+        self.moved = (*self.event_to_board(event), signal)
+
+    def apply_move(self):
+        """Hold the tiles under the latest move once it enters another tile, or record it."""
+        moved, self.moved = self.moved, None
+        if moved is None or moved == self.pressed:
+            self.latency.discard()
+            return
+        pressed, self.pressed = self.pressed, moved
+        x_axis, y_axis, signal = moved
+        if signal == 1 and not self.doubled:
+            self.left_hold.emit(x_axis, y_axis)
+        elif signal == 3:
+            self.double_hold.emit(x_axis, y_axis)
+        else:
+            self.mouse_move.emit(x_axis, y_axis)
+        if signal not in (1, 3):
+            self.latency.discard()  # only recorded, nothing to paint
+            return
+        self.latency.handled()
+        for x, y, _ in filter(None, (pressed, moved)):
+            self.update(self.tile_rect(x - 1, y - 1, 3))  # with neighbours
+
+    def tile_rect(self, x, y, count=1):
+        """Get the rectangle in the widget of a square of tiles."""
+        size = self.tile_size
+        return QRect(x * size - self.offset_x, y * size - self.offset_y,
+                     count * size, count * size)
+
+    def closeEvent(self, event):
+        """Write the history and snapshot of games before closing."""
+        self.autosave.save(self.game)
+        self.autosave.close()
+        self.store.close()
+        self.background.close()
+        if self.mirror is not None:
+            self.mirror.close()
+        if self.latency.log is not None:
+            self.latency.toggle_log(None)
+        super().closeEvent(event)
 
     def run(self):
         """Run the app."""
-        self.setGeometry(135, 177, self.width * self.tile_size,
-                         self.height * self.tile_size)
+        screen = QtWidgets.QApplication.primaryScreen().availableGeometry()
+        self.setGeometry(
+            135, 177,
+            min(self.width * self.tile_size, screen.width() - 135),
+            min(self.height * self.tile_size, screen.height() - 177))
         self.show()
@@ -0,0 +1,106 @@
+"""Frame timing and input latency of the board UI."""
+
+from array import array
+from time import perf_counter_ns
+
+timer = perf_counter_ns
+NS2MS = 1e-6
+SAMPLES = 1024  # samples kept for the percentiles of a metric
+METRICS = ('input', 'backend', 'paint', 'total', 'tiles')
+
+
+class Latency(object):
+    """Latency: frame timing and input-to-paint latency, with percentiles."""
+
+    def __init__(self, samples: int = SAMPLES):
+        """Init empty ring buffers of the metrics."""
+        self.samples: int = samples
+        self.values: dict[str, array] = {m: array('d') for m in METRICS}
+        self.written: dict[str, int] = dict.fromkeys(METRICS, 0)
+        self.offset: float = None  # least offset from event timestamps in ms
+        self.current: tuple[int, int] = None  # event and handling times
+        self.pending: list[int] = []  # event times of inputs not painted yet
+        self.started: int = 0  # start time of the current paint
+        self.frames: int = 0
+        self.log = None  # the file frames are logged into
+
+    def add(self, metric: str, value: float):
+        """Add a sample of a metric, overwriting the oldest one when full."""
+        values = self.values[metric]
+        if len(values) < self.samples:
+            values.append(value)
+        else:
+            values[self.written[metric] % self.samples] = value
+        self.written[metric] += 1
+
+    def input(self, event):
+        """Mark that an input event starts to be handled."""
+        now = timer()
+        if not event.timestamp():
+            self.current = (now, now)  # a synthesized event without a time
+            return
+        # the least offset between both clocks is taken as no delay
+        offset = now * NS2MS - event.timestamp()
+        if self.offset is None or offset < self.offset:
+            self.offset = offset
+        delay = offset - self.offset
+        self.current = (now - round(delay / NS2MS), now)
+
+    def handled(self):
+        """Mark that the backend has finished the operation of an input."""
+        if self.current is None:
+            return
+        (event, start), end = self.current, timer()
+        self.add('input', (start - event) * NS2MS)
+        self.add('backend', (end - start) * NS2MS)
+        self.pending.append(event)
+        self.current = None
+
+    def discard(self):
+        """Discard the input being handled, which needs no paint."""
+        self.current = None
+
+    def paint_started(self):
+        """Mark that a paint starts."""
+        self.started = timer()
+
+    def painted(self, tiles: int):
+        """Mark that a paint has completed, closing the pending inputs."""
+        end = timer()
+        paint = (end - self.started) * NS2MS
+        self.add('paint', paint)
+        self.add('tiles', tiles)
+        for event in self.pending:
+            self.add('total', (end - event) * NS2MS)
+        if self.log is not None:
+            total = max(((end - e) * NS2MS for e in self.pending), default=0)
+            self.log.write(f'{self.frames}\t{tiles}\t{paint:.3f}\t'
+                           f'{len(self.pending)}\t{total:.3f}\n')
+        self.pending.clear()
+        self.frames += 1
+
+    def percentile(self, metric: str, q: float) -> float:
+        """Get a percentile (0 to 100) of the samples of a metric."""
+        values = sorted(self.values[metric])
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(len(values) * q / 100))]
+
+    def report(self) -> list[str]:
+        """Report the p50 and p99 of the metrics, a line for each."""
+        lines = [f'frames {self.frames}']
+        for metric in METRICS:
+            unit = '' if metric == 'tiles' else ' ms'
+            lines.append(f'{metric:8}p50 {self.percentile(metric, 50):8.2f}'
+                         f'  p99 {self.percentile(metric, 99):8.2f}{unit}')
+        return lines
+
+    def toggle_log(self, path: str) -> bool:
+        """Start or stop logging frames into a file, getting whether it is on."""
+        if self.log is None:
+            self.log = open(path, 'a', encoding='utf-8')
+            self.log.write('frame\ttiles\tpaint_ms\tinputs\ttotal_ms\n')
+        else:
+            self.log.close()
+            self.log = None
+        return self.log is not None
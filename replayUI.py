@@ -0,0 +1,48 @@
+"""The controls of the replay player."""
+
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import pyqtSignal, Qt
+
+SPEEDS = (0.25, 0.5, 1, 2, 4, 8, 16)  # playback speeds
+
+
+class replayBar(QtWidgets.QWidget):
+    """The controls of the replay player: play/pause, speed and a scrubber."""
+
+    play = pyqtSignal(bool)
+    speed = pyqtSignal(float)
+    seek = pyqtSignal(float)
+
+    def __init__(self, duration, parent=None):
+        """Init the controls for a replay lasting some seconds."""
+        super(replayBar, self).__init__(parent, Qt.Tool)
+        self.setWindowTitle('Replay')
+        self.button = QtWidgets.QPushButton('Play')
+        self.button.setCheckable(True)
+        self.button.toggled.connect(self.toggle)
+        self.speeds = QtWidgets.QComboBox()
+        self.speeds.addItems([f'{s}x' for s in SPEEDS])
+        self.speeds.setCurrentIndex(SPEEDS.index(1))
+        self.speeds.currentIndexChanged.connect(
+            lambda i: self.speed.emit(SPEEDS[i]))
+        self.slider = QtWidgets.QSlider(Qt.Horizontal)
+        self.slider.setRange(0, int(duration * 1000))  # in milliseconds
+        self.slider.valueChanged.connect(lambda v: self.seek.emit(v / 1000))
+        self.label = QtWidgets.QLabel()
+
+        layout = QtWidgets.QHBoxLayout(self)
+        for widget in (self.button, self.speeds, self.slider, self.label):
+            layout.addWidget(widget)
+        self.set_time(0.0)
+
+    def toggle(self, checked):
+        """Toggle playing."""
+        self.button.setText('Pause' if checked else 'Play')
+        self.play.emit(checked)
+
+    def set_time(self, time):
+        """Show the time without seeking again."""
+        self.slider.blockSignals(True)
+        self.slider.setValue(int(time * 1000))
+        self.slider.blockSignals(False)
+        self.label.setText(f'{time:.2f}')
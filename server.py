@@ -0,0 +1,304 @@
+"""Server: many concurrent game sessions over a JSON-lines socket protocol.
+
+Each line from a client is a request object, answered by one line:
+- {"op": "new", "width": 30, "height": 16, "mines": 99, ...} starts a game
+  with any of the game settings, answered with the session and whole board
+- {"op": "left", "x": 3, "y": 5} and likewise right, double, left_hold,
+  double_hold and nothing operate the game, answered with the changed tiles
+- {"op": "board"} answers the whole board, {"op": "stats"} the statistics
+- {"op": "info"} answers the sessions held by the server
+
+Tiles are sent as [x, y, status] like Game.board_output. Games are timed on
+the server. Only the most recently used games are kept live, the others are
+hibernated into compact snapshots of a few kilobytes.
+"""
+
+from backend.game import Game
+from backend.autosave import encode, decode
+from settings import GameSettings
+from collections import OrderedDict
+from time import perf_counter_ns
+from typing import Iterator
+
+import json
+import asyncio
+import itertools
+
+timer = perf_counter_ns
+NS2S = 1e-9
+LIVE_GAMES = 256  # sessions kept as live games, the others are hibernated
+OPERATIONS = ('left', 'right', 'double', 'left_hold', 'double_hold', 'nothing')
+
+
+class Session(object):
+    """Session: a game of a client, either live or hibernated."""
+
+    def __init__(self, settings: GameSettings):
+        """Start a live game."""
+        self.settings: GameSettings = settings
+        self.game: Game = Game(settings)
+        self.frozen: bytes = None  # snapshot of the game while hibernated
+        self.since: int = 0  # time when hibernated
+
+    def hibernate(self) -> Game:
+        """Drop the live game, keeping only a compact snapshot of it."""
+        game = self.game
+        game.counter.refresh_timer()
+        self.frozen = b'' if game.first else encode(game.snapshot())
+        self.since = timer()
+        self.game = None
+        return game
+
+    def wake(self, game: Game = None) -> Game:
+        """Restore the live game into a spare one, as if the timer ran."""
+        if game is None:
+            game = Game(self.settings)
+        elif not self.frozen:
+            game.init()
+        if self.frozen:
+            snapshot = decode(self.frozen)
+            game.restore(snapshot)
+            if game.in_progress():
+                game.counter.start_timer(snapshot[2] +
+                                         (timer() - self.since) * NS2S)
+                # the client has got the board already
+                game.stable = True
+                game.recently_updated = set()
+        self.game, self.frozen = game, None
+        return game
+
+    def size(self) -> int:
+        """Get the size of the snapshot while hibernated."""
+        return 0 if self.frozen is None else len(self.frozen)
+
+
+class Server(object):
+    """Server: many concurrent game sessions over a JSON-lines socket protocol."""
+
+    def __init__(self, live: int = LIVE_GAMES):
+        """Initialize a server without any sessions."""
+        self.limit: int = live
+        self.sessions: dict[int, Session] = {}
+        self.live: OrderedDict[int, Session] = OrderedDict()  # least recent first
+        self.ids: Iterator[int] = itertools.count(1)
+        # settings shared by sessions, whose games could reuse boards of each other
+        self.settings: dict[str, GameSettings] = {}
+        self.operations: int = 0
+
+    def open(self, settings: GameSettings) -> int:
+        """Open a session, getting its id."""
+        sid = next(self.ids)
+        self.live[sid] = self.sessions[sid] = Session(settings)
+        self.evict()
+        return sid
+
+    def close(self, sid: int):
+        """Close a session."""
+        self.sessions.pop(sid, None)
+        self.live.pop(sid, None)
+
+    def evict(self, settings: GameSettings = None) -> Game:
+        """Hibernate the least recently used games, getting one to be reused."""
+        spare = None
+        while len(self.live) > self.limit:
+            _, session = self.live.popitem(last=False)
+            game = session.hibernate()
+            if game.opts is settings:
+                spare = game
+        return spare
+
+    def get_game(self, sid: int) -> Game:
+        """Get the live game of a session, waking it if hibernated."""
+        session = self.sessions[sid]
+        if session.game is None:
+            self.live[sid] = session
+            session.wake(self.evict(session.settings))
+        else:
+            self.live.move_to_end(sid)
+        return session.game
+
+    def state(self, game: Game, tiles: list) -> dict:
+        """Build the answer of a game with some tiles."""
+        return {
+            'tiles': tiles,
+            'time': round(game.counter.get_time(), 3),
+            'win': game.win,
+            'lose': game.lose,
+        }
+
+    def handle(self, sid: int, request: dict) -> tuple[int, dict]:
+        """Handle a request of a client, getting its session and the answer."""
+        op = request.get('op')
+        if op == 'new':
+            fields = {'mode': 0, **request}
+            del fields['op']
+            settings = GameSettings(**fields)
+            if settings.huge:
+                raise ValueError('Huge boards are not served!')
+            settings = self.settings.setdefault(settings.json(), settings)
+            if sid is not None and self.sessions[sid].settings is settings:
+                game = self.get_game(sid)
+                game.init()  # a new game of the same settings reuses the board
+            else:
+                if sid is not None:
+                    self.close(sid)
+                sid = self.open(settings)
+                game = self.sessions[sid].game
+            return sid, {'session': sid, **self.state(game, game.board_output())}
+        if op == 'info':
+            return sid, {
+                'sessions': len(self.sessions),
+                'live': len(self.live),
+                'hibernated': sum(s.size() for s in self.sessions.values()),
+                'operations': self.operations,
+            }
+        if sid is None:
+            raise ValueError('A game should be started by "new" first!')
+        game = self.get_game(sid)
+        if op in OPERATIONS:
+            if game.win or game.lose:
+                return sid, self.state(game, [])
+            getattr(game, op)(request.get('x', -5), request.get('y', -5))
+            self.operations += 1
+            return sid, self.state(game, game.board_output())
+        if op == 'board':
+            return sid, self.state(game, game.board_output(True))
+        if op == 'stats':
+            return sid, {'stats': game.stats, **self.state(game, [])}
+        raise ValueError(f'Unknown operation {op}!')
+
+    async def serve_client(self, reader: asyncio.StreamReader,
+                           writer: asyncio.StreamWriter): # yapf: disable
+        """Serve a client until it disconnects, closing its session."""
+        sid = None
+        try:
+            async for line in reader:
+                try:
+                    sid, answer = self.handle(sid, json.loads(line))
+                except (ValueError, TypeError, AttributeError) as e:
+                    answer = {'error': str(e)}
+                writer.write(json.dumps(answer, separators=(',', ':')).encode()
+                             + b'\n') # yapf: disable
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if sid is not None:
+                self.close(sid)
+            writer.close()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8765,
+                    path: str = None): # yapf: disable
+        """Serve on a TCP port, or on a unix socket if a path is given."""
+        if path is not None:
+            server = await asyncio.start_unix_server(self.serve_client, path)
+        else:
+            server = await asyncio.start_server(self.serve_client, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+async def connect(host: str, port: int, path: str = None):
+    """Connect to a server, waiting for it to come up."""
+    for _ in range(100):
+        try:
+            if path is not None:
+                return await asyncio.open_unix_connection(path)
+            return await asyncio.open_connection(host, port)
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise ConnectionError('The server is not up!')
+
+
+async def player(address: tuple, settings: dict, deadline: float,
+                 latencies: list[float]) -> int: # yapf: disable
+    """Play random left clicks on covered tiles until the deadline."""
+    import random
+    reader, writer = await connect(*address)
+    games = 0
+
+    async def request(message: dict) -> dict:
+        start = timer()
+        writer.write(json.dumps(message).encode() + b'\n')
+        answer = json.loads(await reader.readline())
+        latencies.append((timer() - start) * NS2S * 1e3)
+        return answer
+
+    answer = await request({'op': 'new', **settings})
+    while timer() < deadline:
+        covered = {(x, y) for x, y, s in answer['tiles'] if s == 9}
+        while not (answer['win'] or answer['lose']) and timer() < deadline:
+            x, y = random.choice(tuple(covered))
+            answer = await request({'op': 'left', 'x': x, 'y': y})
+            for x, y, s in answer['tiles']:
+                if s == 9:
+                    covered.add((x, y))
+                else:
+                    covered.discard((x, y))
+        games += 1
+        answer = await request({'op': 'new', **settings})
+    writer.close()
+    return games
+
+
+async def bench(address: tuple, clients: int, seconds: float,
+                settings: dict): # yapf: disable
+    """Measure the throughput and latency of a server with many clients."""
+    latencies: list[float] = []
+    deadline = timer() + seconds / NS2S
+    players = asyncio.gather(*(player(address, settings, deadline, latencies)
+                               for _ in range(clients)))
+    # ask for the sessions while all of the players are still connected
+    await asyncio.sleep(seconds * 0.9)
+    reader, writer = await connect(*address)
+    writer.write(b'{"op": "info"}\n')
+    info = json.loads(await reader.readline())
+    writer.close()
+    games = await players
+    latencies.sort()
+    count = max(len(latencies), 1)
+    print(f'clients {clients}  games {sum(games)}  requests {len(latencies)}'
+          f'  {len(latencies) / seconds:.0f}/s')
+    for q in (50, 90, 99):
+        print(f'p{q} {latencies[min(count - 1, count * q // 100)]:.3f} ms')
+    print(f'server {info}')
+
+
+if __name__ == '__main__':
+    import sys
+    import argparse
+    import subprocess
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help='serve on a unix socket instead')
+    parser.add_argument('--live', type=int, default=LIVE_GAMES)
+    parser.add_argument('--bench', action='store_true',
+                        help='run the load generator against the server')
+    parser.add_argument('--spawn', action='store_true',
+                        help='spawn a local server to be measured')
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--size', default='30x16x99',
+                        help='board size of the load, as WxHxMINES')
+    args = parser.parse_args()
+    address = (args.host, args.port, args.unix)
+
+    if not args.bench:
+        asyncio.run(Server(args.live).serve(*address))
+    else:
+        width, height, mines = map(int, args.size.split('x'))
+        spawned = None
+        if args.spawn:
+            spawned = subprocess.Popen([
+                sys.executable, __file__, '--host', args.host, '--port',
+                str(args.port), '--live', str(args.live)
+            ] + (['--unix', args.unix] if args.unix else []))
+        try:
+            asyncio.run(
+                bench(address, args.clients, args.seconds,
+                      dict(width=width, height=height, mines=mines)))
+        finally:
+            if spawned is not None:
+                spawned.terminate()
@@ -3,6 +3,7 @@
 import os
 import json
 from pydantic import BaseModel, validator
+from backend.generation import POLICIES
 
 
 def check_range(item: int, lb: int = None, ub: int = None):
@@ -20,24 +21,41 @@ class GameSettings(BaseModel):
     """Settings for game."""
 
     mode: int = 3
+    huge: bool = False  # huge-board mode, beyond the limits of a normal board
     height: int = 16
     width: int = 30
     mines: int = 99
     bfs: bool = False
     easy_flag: bool = False
     nf: bool = False
+    first_click: str = 'safe'  # one of the policies of the first click
+    opening_size: int = 20  # least tiles opened by the first click of 'opening'
 
     @validator('height', 'width')
-    def check_height_width(cls, v: int):
+    def check_height_width(cls, v: int, values: dict):
         """Check the range of height and width."""
-        check_range(v, 1, 80)
+        check_range(v, 1, 4000 if values['huge'] else 80)
         return v
 
     @validator('mines')
     def check_mines(cls, v: int, values: dict):
         """Check the range of mines."""
         # Check mine count according to width and height and maximum together
-        check_range(v, 0, min(999, values['width'] * values['height'] - 1))
+        limit = values['width'] * values['height'] - 1
+        check_range(v, 0, limit if values['huge'] else min(999, limit))
+        return v
+
+    @validator('first_click')
+    def check_first_click(cls, v: str):
+        """Check the policy of the first click."""
+        if v not in POLICIES:
+            raise ValueError(f'First click {v} should be one of {POLICIES}!')
+        return v
+
+    @validator('opening_size')
+    def check_opening_size(cls, v: int, values: dict):
+        """Check the least size of the opening of the first click."""
+        check_range(v, 1, values['width'] * values['height'])
         return v
 
 
@@ -46,6 +64,7 @@ class UISettings(BaseModel):
 
     skin: str = 'default'
     size: int = 32
+    overlay: str = 'minesweeper-stats'  # shared memory of live statistics, '' for none
 
     @validator('size')
     def check_tile_size(cls, v: int):